@@ -0,0 +1,171 @@
+"""
+Functions for reading questions and answers from Anki .apkg files.
+"""
+
+import contextlib
+import fnmatch
+import glob
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+COLLECTION = "collection.anki2"
+HTML_TAG = re.compile("<.*?>")
+
+
+def is_apkg(path):
+    """
+    Return True if the file at path looks like an Anki .apkg file.
+    """
+    return path.endswith(".apkg") and zipfile.is_zipfile(path)
+
+
+@contextlib.contextmanager
+def extract_collection(apkg_path):
+    """
+    Context manager which extracts the collection database from the .apkg
+    file at apkg_path into a private temporary directory, yielding the path
+    of the database. The directory is removed on exit.
+    """
+    with tempfile.TemporaryDirectory(prefix="curses-anki-") as directory:
+        db_path = os.path.join(directory, COLLECTION)
+        with zipfile.ZipFile(apkg_path, "r") as zip_file, \
+                zip_file.open(COLLECTION) as src, open(db_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        yield db_path
+
+
+def iter_notes(db_path, batch_size=1000):
+    """
+    Yield the fields of each note in the database at db_path as a list of
+    strings, fetching notes batch_size at a time.
+    """
+    # See:
+    # https://decks.fandom.com/wiki/Anki_APKG_format_documentation
+    conn = sqlite3.connect(db_path)
+    try:
+        c = conn.cursor()
+        c.execute("SELECT flds FROM notes")
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            for (content,) in rows:
+                yield content.split("\x1f")
+    finally:
+        conn.close()
+
+
+def note_to_pair(parts, question_index=-1, answer_index=-1):
+    """
+    Return a (question, answer) tuple from the fields of a note, or None if
+    the note has no such fields. If question_index or answer_index is
+    negative, fields are guessed by looking at their content.
+    """
+    if question_index < 0 or answer_index < 0:
+        question_index = 0
+        answer_index = 1
+        # Attempt to get text contents from the note field
+        parts = [s for s in parts if "[" not in s]
+    if max(question_index, answer_index) > len(parts) - 1:
+        return None
+    return (
+        prettify_text(parts[question_index]),
+        prettify_text(parts[answer_index])
+    )
+
+
+def iter_pairs(db_path, question_index=-1, answer_index=-1):
+    """
+    Yield (question, answer) tuples from the notes in the database at
+    db_path, warning on stderr about notes without the requested fields.
+    """
+    for parts in iter_notes(db_path):
+        pair = note_to_pair(parts, question_index, answer_index)
+        if pair is None:
+            print(
+                "Invalid note found: " + "\x1f".join(parts), file=sys.stderr
+            )
+        else:
+            yield pair
+
+
+@contextlib.contextmanager
+def open_apkg_pairs(apkg_path, question_index=-1, answer_index=-1):
+    """
+    Context manager yielding an iterator of (question, answer) tuples from
+    the .apkg file at apkg_path.
+    """
+    with extract_collection(apkg_path) as db_path:
+        yield iter_pairs(db_path, question_index, answer_index)
+
+
+def read_apkg_pairs(apkg_path, question_index=-1, answer_index=-1):
+    """
+    Return a list of (question, answer) tuples from the .apkg file at
+    apkg_path.
+    """
+    with open_apkg_pairs(apkg_path, question_index, answer_index) as pairs:
+        return list(pairs)
+
+
+def expand_apkg_paths(paths):
+    """
+    Return a sorted list of the .apkg files given by paths, where each path
+    may be a file, a directory (all .apkg files within it are used) or a
+    glob pattern.
+    """
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(glob.glob(os.path.join(path, "*.apkg")))
+        elif any(c in path for c in "*?["):
+            expanded.extend(glob.glob(path))
+        else:
+            expanded.append(path)
+    return sorted(set(expanded))
+
+
+def fields_for(apkg_path, deck_fields, default=(-1, -1)):
+    """
+    Return the (question_index, answer_index) tuple to use for apkg_path,
+    deck_fields being a list of (pattern, question_index, answer_index)
+    tuples whose patterns are matched against the file name of apkg_path.
+    The last matching pattern wins.
+    """
+    name = os.path.basename(apkg_path)
+    fields = default
+    for pattern, question_index, answer_index in deck_fields:
+        if fnmatch.fnmatch(name, pattern):
+            fields = question_index, answer_index
+    return fields
+
+
+def read_many_apkg_pairs(apkg_paths, deck_fields=(), default=(-1, -1),
+                         processes=None):
+    """
+    Read the .apkg files apkg_paths in parallel worker processes and return
+    an OrderedDict of their merged (question, answer) pairs, in the order of
+    apkg_paths. When a question appears more than once, the last answer
+    read wins.
+    """
+    merged = OrderedDict()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(
+                read_apkg_pairs, path, *fields_for(path, deck_fields, default)
+            ) for path in apkg_paths
+        ]
+        for future in futures:
+            merged.update(future.result())
+    return merged
+
+
+def prettify_text(text):
+    return HTML_TAG.sub(" ", text)
@@ -4,8 +4,12 @@
 Classes for generating answers based on a specified question.
 """
 
-import random, re
+import collections, random, re
+from array import array
 from collections import OrderedDict
+from collections.abc import Mapping
+
+from curses_questions.question_providers import reservoir_sample
 
 
 class RandomizedAnswerProvider:
@@ -14,27 +18,99 @@ class RandomizedAnswerProvider:
     from other questions.
     """
 
-    def __init__(self, question_pool, no_choices=3):
+    def __init__(self, question_pool, no_choices=3, extra_answers=(),
+                 answer_index=None):
         self.question_pool = question_pool
         self.no_choices = no_choices
+        # Answers which may be drawn as incorrect answers but which do not
+        # belong to any question in question_pool
+        self.extra_answers = extra_answers
+        # Number of questions (or extra answers) having each answer, built
+        # by the first update_pool()
+        self.answer_counts = None
         # Just to be safe
         if not self.question_pool:
             self.question_pool = {"Your question Here": "Your answer here"}
+            answer_index = None
+        if answer_index:
+            # A prebuilt (answers, answer_positions) tuple, see
+            # build_answer_index()
+            self.answers, self.answer_positions = answer_index
+        else:
+            self.build_answer_index()
 
-    @classmethod
-    def parse_from_iter(cls, iterable, no_choices=3, delimiter="\t"):
-        question_pool = OrderedDict()
+    def build_answer_index(self):
+        """
+        (Re)build the sorted, deduplicated list of answers used to draw
+        incorrect answers. Call this if question_pool is modified after
+        construction.
+        """
+        self.answers = sorted(
+            set(self.question_pool.values()).union(self.extra_answers)
+        )
+        self.answer_positions = {
+            answer: position for position, answer in enumerate(self.answers)
+        }
+
+    def update_pool(self, removed=(), added=()):
+        """
+        Remove the questions removed from question_pool and add the
+        (question, answer) tuples added, replacing the answers of questions
+        already present. The answer index is updated in place rather than
+        rebuilt, so this takes time proportional to the number of questions
+        changed, though answers are no longer sorted afterwards.
+        question_pool must be a dict.
+        """
+        if self.answer_counts is None:
+            self.answer_counts = collections.Counter(
+                self.question_pool.values()
+            )
+            self.answer_counts.update(self.extra_answers)
+        for question in removed:
+            if question in self.question_pool:
+                self.discard_answer(self.question_pool.pop(question))
+        for question, answer in added:
+            if question in self.question_pool:
+                self.discard_answer(self.question_pool[question])
+            self.question_pool[question] = answer
+            self.answer_counts[answer] += 1
+            if answer not in self.answer_positions:
+                self.answer_positions[answer] = len(self.answers)
+                self.answers.append(answer)
+
+    def discard_answer(self, answer):
+        # Remove one use of answer, removing it from the answer index when
+        # it has no uses left by moving the last answer into its position
+        self.answer_counts[answer] -= 1
+        if self.answer_counts[answer] > 0:
+            return
+        del self.answer_counts[answer]
+        position = self.answer_positions.pop(answer)
+        last = self.answers.pop()
+        if last != answer:
+            self.answers[position] = last
+            self.answer_positions[last] = position
+
+    @staticmethod
+    def iter_pairs(iterable, delimiter="\t"):
+        """
+        Yield (question, answer) tuples from lines of iterable which contain
+        delimiter.
+        """
         for line in iterable:
             split = line.split(delimiter, 1)
             if (len(split) == 2):
-                question_pool[split[0]] = split[1]
-        return cls(question_pool, no_choices)
+                yield split[0], split[1]
 
-    @classmethod
-    def parse_from_iter_regex(cls, iterable, regex, no_choices=3):
-        question_pool = OrderedDict()
+    @staticmethod
+    def iter_pairs_regex(iterable, regex):
+        """
+        Yield (question, answer) tuples from lines of iterable matching regex,
+        taking the question and answer as the first and second capture group.
+        """
+        pattern = re.compile(regex)
         for line in iterable:
-            match = re.match(regex, line)
+            match = pattern.match(line)
             if not match:
                 continue
             try:
@@ -42,14 +118,55 @@ class RandomizedAnswerProvider:
             except IndexError:
                 continue
             else:
-                question_pool[q] = a
+                yield q, a
+
+    @classmethod
+    def parse_from_iter(cls, iterable, no_choices=3, delimiter="\t"):
+        question_pool = OrderedDict(cls.iter_pairs(iterable, delimiter))
+        return cls(question_pool, no_choices)
+
+    @classmethod
+    def parse_from_iter_regex(cls, iterable, regex, no_choices=3):
+        question_pool = OrderedDict(cls.iter_pairs_regex(iterable, regex))
         return cls(question_pool, no_choices)
 
+    @classmethod
+    def sample_from_iter(
+            cls, iterable, no_questions, no_choices=3, delimiter="\t"):
+        return cls.sample_from_pairs(
+            cls.iter_pairs(iterable, delimiter), no_questions, no_choices
+        )
+
+    @classmethod
+    def sample_from_iter_regex(cls, iterable, regex, no_questions,
+                               no_choices=3):
+        return cls.sample_from_pairs(
+            cls.iter_pairs_regex(iterable, regex), no_questions, no_choices
+        )
+
+    @classmethod
+    def sample_from_pairs(cls, pairs, no_questions, no_choices=3):
+        """
+        Create a provider holding no_questions questions chosen uniformly at
+        random from the (question, answer) iterable pairs, which is consumed
+        lazily. Only no_questions * no_choices pairs are held in memory at
+        any one time, the answers of those not chosen as questions are kept
+        as incorrect answers.
+        """
+        sample = reservoir_sample(pairs, no_questions * no_choices)
+        random.shuffle(sample)
+        question_pool = OrderedDict(sample[:no_questions])
+        extra_answers = [answer for _, answer in sample[no_questions:]]
+        return cls(question_pool, no_choices, extra_answers)
+
     def get_all_questions(self):
         """
         Return a mapping of questions to their correct answers.
         """
-        return dict(self.question_pool)
+        if isinstance(self.question_pool, dict):
+            return dict(self.question_pool)
+        # Read only mappings such as compiled decks need not be copied
+        return self.question_pool
 
     def get_answers(self, chosen_question):
         """
@@ -64,15 +181,127 @@ class RandomizedAnswerProvider:
                 "chosen_question: '{question}' is not in the question_pool"
                 .format(question=chosen_question)
             )
-        exclusion_set = set([self.question_pool[chosen_question]])
-        choice_set = set(self.question_pool.values()) - exclusion_set
-        # random choice without replacement
-        choices = random.sample(sorted(choice_set), no_choices - 1)
         correct_answer = self.question_pool[chosen_question]
+        choices = self.incorrect_answers(correct_answer, no_choices - 1)
         # Insert correct answer into random place in list
         choices.insert(random.randint(0, no_choices - 1), correct_answer)
         return choices
 
+    def incorrect_answers(self, correct_answer, no_answers):
+        """
+        Return a list of no_answers answers other than correct_answer.
+        """
+        # Sample positions from the answer index with the correct answer
+        # removed, sampling from a range means this is O(no_answers) rather
+        # than O(len(question_pool))
+        excluded = self.answer_positions[correct_answer]
+        return [
+            self.answers[i + (i >= excluded)] for i in
+            random.sample(range(len(self.answers) - 1), no_answers)
+        ]
+
+
+class SimilarAnswerProvider(RandomizedAnswerProvider):
+    """
+    Obtains false answers for a question by selecting correct answers from
+    other questions which look similar to the question's correct answer, so
+    that a year is offered alongside other years rather than city names.
+    """
+
+    # Incorrect answers are drawn from this many times as many of the most
+    # similar answers, so the same question is not always offered the same
+    # answers
+    SPREAD = 3
+
+    def __init__(self, question_pool, no_choices=3, extra_answers=(),
+                 answer_index=None, cache=False):
+        # Whether to save the similarity index to the cache directory
+        self.cache = cache
+        self.similarity_index = None
+        super().__init__(
+            question_pool, no_choices, extra_answers, answer_index
+        )
+        if self.similarity_index is None:
+            self.build_similarity_index()
+
+    @classmethod
+    def from_provider(cls, answer_provider, cache=False):
+        """
+        Create a provider with the questions and answers of the
+        RandomizedAnswerProvider answer_provider.
+        """
+        return cls(
+            answer_provider.question_pool,
+            answer_provider.no_choices,
+            answer_provider.extra_answers,
+            (answer_provider.answers, answer_provider.answer_positions),
+            cache,
+        )
+
+    def build_answer_index(self):
+        super().build_answer_index()
+        self.build_similarity_index()
+
+    def build_similarity_index(self):
+        # Imported here rather than at the top of the module as NumPy is
+        # slow to import, and only needed with --similar
+        from curses_questions.similarity import similarity_index
+        self.similarity_index = similarity_index(self.answers, self.cache)
+
+    def incorrect_answers(self, correct_answer, no_answers):
+        neighbours = self.similarity_index.neighbours(
+            self.answer_positions[correct_answer], no_answers * self.SPREAD
+        )
+        return [
+            self.answers[i] for i in random.sample(neighbours, no_answers)
+        ]
+
+
+class CompactAnswers(Mapping):
+    """
+    A read only mapping of questions to lists of answers which stores each
+    distinct answer string once. The answers of all questions are held as
+    integer ids in a single array, question i's answers being those between
+    starts[i] and starts[i + 1].
+    """
+
+    __slots__ = ("records", "strings", "answer_ids", "starts")
+
+    def __init__(self, records):
+        # Questions to their index in starts
+        self.records = {}
+        # Distinct answers, and the ids of answers indexing into them
+        self.strings = []
+        self.answer_ids = array("I")
+        self.starts = array("Q", [0])
+        ids = {}
+        for question, answers in records:
+            for answer in answers:
+                answer_id = ids.get(answer)
+                if answer_id is None:
+                    answer_id = ids[answer] = len(self.strings)
+                    self.strings.append(answer)
+                self.answer_ids.append(answer_id)
+            self.records[question] = len(self.starts) - 1
+            self.starts.append(len(self.answer_ids))
+
+    def __getitem__(self, question):
+        record = self.records[question]
+        strings = self.strings
+        return [
+            strings[i] for i in
+            self.answer_ids[self.starts[record]:self.starts[record + 1]]
+        ]
+
+    def __contains__(self, question):
+        return question in self.records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
 
 class PresetAnswerProvider:
     """
@@ -80,12 +309,16 @@ class PresetAnswerProvider:
     question.
     """
 
+    __slots__ = ("question_to_answers_map",)
+
     def __init__(self, question_to_answers_map):
         # Mapping of questions to lists of answers, correct answer is
         # implicitly first string in list
         self.question_to_answers_map = question_to_answers_map
         if not self.question_to_answers_map:
-            self.question_pool = {"Your question Here": "Your answer here"}
+            self.question_to_answers_map = {
+                "Your question Here": ["Your answer here"]
+            }
 
     def get_all_questions(self):
         """
@@ -96,14 +329,49 @@ class PresetAnswerProvider:
             for question in self.question_to_answers_map.keys()
         }
 
-    @classmethod
-    def parse_from_iter(cls, iterable, delimiter="\t"):
-        question_to_answers_map = dict()
+    def update_pool(self, removed=(), added=()):
+        """
+        Remove the questions removed and add the (question, answers) tuples
+        added, replacing the answers of questions already present.
+        """
+        if not isinstance(self.question_to_answers_map, dict):
+            self.question_to_answers_map = dict(self.question_to_answers_map)
+        for question in removed:
+            self.question_to_answers_map.pop(question, None)
+        self.question_to_answers_map.update(added)
+
+    @staticmethod
+    def iter_records(iterable, delimiter="\t"):
+        """
+        Yield (question, answers) tuples from lines of iterable which contain
+        delimiter.
+        """
         for line in iterable:
             question, *answers = line.split(delimiter)
             if answers:
-                question_to_answers_map[question] = answers
-        return cls(question_to_answers_map)
+                yield question, answers
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Create a provider from an iterable of (question, answers) tuples,
+        stored as CompactAnswers.
+        """
+        return cls(CompactAnswers(records))
+
+    @classmethod
+    def parse_from_iter(cls, iterable, delimiter="\t"):
+        return cls.from_records(cls.iter_records(iterable, delimiter))
+
+    @classmethod
+    def sample_from_iter(cls, iterable, no_questions, delimiter="\t"):
+        """
+        Create a provider holding no_questions questions chosen uniformly at
+        random from the lines of iterable, which is consumed lazily.
+        """
+        return cls.from_records(reservoir_sample(
+            cls.iter_records(iterable, delimiter), no_questions
+        ))
 
     def get_answers(self, chosen_question):
         if chosen_question not in self.question_to_answers_map:
@@ -0,0 +1,240 @@
+"""
+Generate many quizzes at once without a terminal, in parallel worker
+processes. Quizzes are generated in chunks of CHUNK_SIZE, each chunk with
+its own random number generator seeded from the overall seed and the
+chunk's index, so output depends only on the seed and not on the number of
+workers.
+"""
+
+import collections
+import csv
+import io
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from curses_questions.answer_providers import RandomizedAnswerProvider
+from curses_questions.question_providers import question_items
+
+CHUNK_SIZE = 256
+# Chunks submitted to each worker process but not yet yielded
+PENDING_PER_WORKER = 2
+FORMATS = ("jsonl", "csv")
+
+# The answer provider and its items in worker processes, see init_worker()
+_answer_provider = None
+_items = None
+_correct_positions = None
+
+
+def capped_choices(answer_provider):
+    """
+    Return the number of choices quizzes give each question of the
+    RandomizedAnswerProvider answer_provider, which is fewer than its
+    no_choices if it has fewer questions or distinct answers.
+    """
+    return min(
+        answer_provider.no_choices, len(answer_provider.question_pool),
+        len(answer_provider.answers)
+    )
+
+
+def init_worker(answer_provider, use_numpy):
+    global _answer_provider, _items, _correct_positions
+    if hasattr(answer_provider, "answers"):
+        # get_answers() can't sample more incorrect answers than there are,
+        # this is the worker's own copy of answer_provider
+        answer_provider.no_choices = capped_choices(answer_provider)
+    _answer_provider = answer_provider
+    _items = question_items(answer_provider.get_all_questions())
+    _correct_positions = None
+    if use_numpy:
+        _correct_positions = numpy.array(
+            [answer_provider.answer_positions[a] for _, a in _items],
+            dtype=numpy.int64
+        )
+
+
+def can_vectorize(answer_provider):
+    """
+    Return True if quizzes for answer_provider may be generated with NumPy.
+    """
+    return numpy is not None and \
+        type(answer_provider) is RandomizedAnswerProvider
+
+
+def sample_quizzes(no_quizzes, no_questions, seed):
+    """
+    Return a list of quizzes, each a list of (question, choices,
+    correct_answer) tuples, choosing questions and answers using the
+    answer provider's get_answers() with the random module seeded with
+    seed.
+    """
+    random.seed(seed)
+    no_questions = min(no_questions, len(_items))
+    quizzes = []
+    for _ in range(no_quizzes):
+        quiz = []
+        for index in random.sample(range(len(_items)), no_questions):
+            question, correct_answer = _items[index]
+            quiz.append((
+                question, _answer_provider.get_answers(question),
+                correct_answer
+            ))
+        quizzes.append(quiz)
+    return quizzes
+
+
+def _distinct_rows(rng, array, high, excluded=None):
+    # Redraw rows of the integer array (along its last axis) containing
+    # duplicates, which are rare when high is much larger than the row
+    # length. Values at or above excluded (if given) are shifted up by one.
+    ordered = numpy.sort(array, axis=-1)
+    duplicates = numpy.argwhere(
+        (ordered[..., 1:] == ordered[..., :-1]).any(axis=-1)
+    )
+    for row in map(tuple, duplicates):
+        array[row] = rng.choice(high, array.shape[-1], replace=False)
+    if excluded is not None:
+        array += array >= excluded[..., None]
+    return array
+
+
+def vectorized_quizzes(no_quizzes, no_questions, seed):
+    """
+    Return a list of quizzes as sample_quizzes() does, drawing the question
+    and incorrect answer indices of every quiz with a few NumPy calls. The
+    answer provider must be a RandomizedAnswerProvider.
+    """
+    rng = numpy.random.default_rng(seed)
+    answers = _answer_provider.answers
+    no_items = len(_items)
+    no_questions = min(no_questions, no_items)
+    no_choices = _answer_provider.no_choices
+    if 2 * no_questions > no_items:
+        questions = numpy.array([
+            rng.permutation(no_items)[:no_questions]
+            for _ in range(no_quizzes)
+        ]).reshape(no_quizzes, no_questions)
+    else:
+        questions = _distinct_rows(
+            rng,
+            rng.integers(0, no_items, (no_quizzes, no_questions)),
+            no_items
+        )
+    incorrect = _distinct_rows(
+        rng,
+        rng.integers(
+            0, len(answers) - 1, (no_quizzes, no_questions, no_choices - 1)
+        ),
+        len(answers) - 1,
+        _correct_positions[questions]
+    )
+    positions = rng.integers(0, no_choices, (no_quizzes, no_questions))
+    quizzes = []
+    for quiz_questions, quiz_incorrect, quiz_positions in zip(
+            questions.tolist(), incorrect.tolist(), positions.tolist()):
+        quiz = []
+        for index, answer_indices, position in zip(
+                quiz_questions, quiz_incorrect, quiz_positions):
+            question, correct_answer = _items[index]
+            choices = [answers[i] for i in answer_indices]
+            choices.insert(position, correct_answer)
+            quiz.append((question, choices, correct_answer))
+        quizzes.append(quiz)
+    return quizzes
+
+
+def format_quizzes(quizzes, first_quiz, output_format):
+    """
+    Return quizzes numbered from first_quiz as JSON Lines (one quiz per
+    line) or CSV (one question per row) text. Trailing newlines left on
+    questions and answers by parsing are removed.
+    """
+    if output_format == "jsonl":
+        return "".join(
+            json.dumps({
+                "quiz": first_quiz + i,
+                "questions": [
+                    {
+                        "question": question.rstrip("\r\n"),
+                        "choices": [c.rstrip("\r\n") for c in choices],
+                    } for question, choices, _ in quiz
+                ],
+                "answer_key": [
+                    choices.index(correct_answer) + 1
+                    for _, choices, correct_answer in quiz
+                ],
+            }, ensure_ascii=False) + "\n" for i, quiz in enumerate(quizzes)
+        )
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for i, quiz in enumerate(quizzes):
+        for number, (question, choices, correct_answer) in enumerate(quiz):
+            writer.writerow(
+                [first_quiz + i, number + 1, question.rstrip("\r\n"),
+                 choices.index(correct_answer) + 1] +
+                [c.rstrip("\r\n") for c in choices]
+            )
+    return output.getvalue()
+
+
+def generate_chunk(chunk, no_quizzes, no_questions, seed, output_format):
+    """
+    Return chunk number chunk of the quizzes as formatted text.
+    """
+    first_quiz = chunk * CHUNK_SIZE
+    count = min(CHUNK_SIZE, no_quizzes - first_quiz)
+    if _correct_positions is not None:
+        quizzes = vectorized_quizzes(
+            count, no_questions, [seed % (1 << 64), chunk]
+        )
+    else:
+        quizzes = sample_quizzes(
+            count, no_questions, "{seed}:{chunk}".format(
+                seed=seed, chunk=chunk
+            )
+        )
+    return format_quizzes(quizzes, first_quiz, output_format)
+
+
+def csv_header(no_choices):
+    return ",".join(
+        ["quiz", "number", "question", "answer"] +
+        ["choice_{n}".format(n=n + 1) for n in range(no_choices)]
+    ) + "\r\n"
+
+
+def generate_quizzes(answer_provider, no_quizzes, no_questions, seed,
+                     output_format="jsonl", processes=None, use_numpy=True):
+    """
+    Yield formatted text of no_quizzes quizzes of no_questions questions
+    each, generated by processes worker processes. NumPy is used if
+    use_numpy is True and it is installed and supports answer_provider,
+    which changes the quizzes generated for a given seed.
+    """
+    use_numpy = use_numpy and can_vectorize(answer_provider)
+    no_chunks = -(-no_quizzes // CHUNK_SIZE)
+    max_pending = PENDING_PER_WORKER * (processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=init_worker,
+            initargs=(answer_provider, use_numpy)) as executor:
+        # Chunks are submitted as earlier ones are yielded, so finished
+        # chunks don't pile up when the output is written slowly
+        pending = collections.deque()
+        for chunk in range(no_chunks):
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(executor.submit(
+                generate_chunk, chunk, no_quizzes, no_questions, seed,
+                output_format
+            ))
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,335 @@
+"""
+A compiled binary deck format which can be memory mapped, so that loading
+a previously parsed deck only touches the records which are asked for.
+
+A compiled deck consists of a header, a buffer of UTF-8 encoded strings and
+four tables of unsigned 64 bit integers (in the native byte order, compiled
+decks are only meant to be read on the machine they were written on):
+
+    header            magic, no. records, no. strings, no. answers
+    string buffer     padded to a multiple of 8 bytes
+    string offsets    (no. strings + 1) byte offsets into the string buffer
+    record starts     (no. records + 1) indices into the string offsets,
+                      record i consists of a question followed by its
+                      answers
+    question order    record indices, sorted by question
+    answer order      string indices of distinct correct answers, sorted
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from collections.abc import ItemsView, Mapping, Sequence
+
+MAGIC = b"CQDECK01"
+HEADER = struct.Struct("=8sQQQ")
+
+
+def cache_dir():
+    """
+    Return the directory compiled decks are cached in.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "curses-questions")
+
+
+def cache_path(path, delimiter="\t", regex=None, preset_answers=False,
+               fields=None):
+    """
+    Return the path of the compiled deck for the file at path parsed with
+    the given options. The path changes whenever the file's mtime or size
+    does, so stale decks are never read. Its name starts with a digest of
+    the file's path and options alone, shared with the decks cached for
+    earlier versions of the file, see remove_stale_decks().
+    """
+    stat = os.stat(path)
+    deck_key = repr((
+        MAGIC, os.path.abspath(path), delimiter, regex, preset_answers,
+        fields
+    ))
+    version_key = repr((stat.st_mtime_ns, stat.st_size))
+    return os.path.join(cache_dir(), "{deck}-{version}.deck".format(
+        deck=hashlib.sha1(deck_key.encode("utf-8")).hexdigest(),
+        version=hashlib.sha1(version_key.encode("utf-8")).hexdigest()[:16],
+    ))
+
+
+def remove_stale_decks(path):
+    """
+    Remove the decks cached for earlier versions of the file and options
+    the cached deck at path was compiled from.
+    """
+    directory, name = os.path.split(path)
+    prefix = name.partition("-")[0] + "-"
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for other in names:
+        if other != name and other.startswith(prefix) and \
+           other.endswith(".deck"):
+            try:
+                os.remove(os.path.join(directory, other))
+            except OSError:
+                # Removed by another run at the same time
+                pass
+
+
+def is_compiled_deck(path):
+    """
+    Return True if the file at path is a compiled deck.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_deck(path, records, answer_index=False):
+    """
+    Write the (question, answers) tuples in records to a compiled deck at
+    path. If answer_index is True, a sorted index of the distinct correct
+    answers is also written, as required by RandomizedAnswerProvider.
+    The file is written atomically.
+    """
+    string_offsets = array("Q", [0])
+    record_starts = array("Q", [0])
+    questions = []
+    answer_ids = {}
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # Written again once the counts are known
+            f.write(HEADER.pack(MAGIC, 0, 0, 0))
+            for question, answers in records:
+                questions.append((question, len(record_starts) - 1))
+                for i, string in enumerate([question] + list(answers)):
+                    if i == 1 and answer_index:
+                        answer_ids.setdefault(string, len(string_offsets) - 1)
+                    string_offsets.append(
+                        string_offsets[-1] + f.write(string.encode("utf-8"))
+                    )
+                record_starts.append(len(string_offsets) - 1)
+            # Align the tables
+            f.write(bytes(-string_offsets[-1] % 8))
+            question_order = array(
+                "Q", (record for _, record in sorted(questions))
+            )
+            answer_order = array(
+                "Q", (answer_ids[answer] for answer in sorted(answer_ids))
+            )
+            for table in (
+                    string_offsets, record_starts, question_order,
+                    answer_order):
+                table.tofile(f)
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, len(record_starts) - 1, len(string_offsets) - 1,
+                len(answer_order)
+            ))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class CompiledDeck:
+    """
+    A read only, memory mapped view of a compiled deck.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.no_records, no_strings, no_answers = \
+            HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            raise ValueError(
+                "'{path}' is not a compiled deck".format(path=path)
+            )
+        view = memoryview(self.mmap)
+        # The size of the string buffer is the last of the string offsets,
+        # which is followed by the other three tables
+        string_bytes, = struct.unpack_from(
+            "=Q", self.mmap,
+            len(self.mmap) - 8 * (2 * self.no_records + no_answers + 2)
+        )
+        self.strings = view[HEADER.size:HEADER.size + string_bytes]
+        position = HEADER.size + string_bytes + (-string_bytes % 8)
+        tables = []
+        for length in (
+                no_strings + 1, self.no_records + 1, self.no_records,
+                no_answers):
+            end = position + 8 * length
+            tables.append(view[position:end].cast("Q"))
+            position = end
+        (self.string_offsets, self.record_starts, self.question_order,
+         self.answer_order) = tables
+
+    def __len__(self):
+        return self.no_records
+
+    def string(self, index):
+        start, end = self.string_offsets[index], self.string_offsets[index + 1]
+        return str(self.strings[start:end], "utf-8")
+
+    def question(self, record):
+        return self.string(self.record_starts[record])
+
+    def answers(self, record):
+        return [
+            self.string(i) for i in range(
+                self.record_starts[record] + 1, self.record_starts[record + 1]
+            )
+        ]
+
+    def find(self, question):
+        """
+        Return the index of the record for question, or -1 if there is no
+        such record.
+        """
+        position = _bisect(
+            self.question_order, question,
+            lambda record: self.question(record)
+        )
+        if position < len(self.question_order):
+            record = self.question_order[position]
+            if self.question(record) == question:
+                return record
+        return -1
+
+    def question_pool(self):
+        """
+        Return a mapping of questions to their correct answers.
+        """
+        return _QuestionPool(self, lambda record: self.answers(record)[0])
+
+    def question_to_answers_map(self):
+        """
+        Return a mapping of questions to their lists of answers.
+        """
+        return _QuestionPool(self, self.answers)
+
+    def answer_index(self):
+        """
+        Return the sorted distinct correct answers of the deck, and a
+        mapping of those answers to their positions, in the form used by
+        RandomizedAnswerProvider.
+        """
+        answers = _SortedAnswers(self)
+        return answers, _AnswerPositions(answers)
+
+    def close(self):
+        self.strings.release()
+        for table in (
+                self.string_offsets, self.record_starts, self.question_order,
+                self.answer_order):
+            table.release()
+        self.mmap.close()
+
+
+def _bisect(sequence, value, key):
+    # bisect_left over sequence ordered by key, bisect only takes a key
+    # argument from python 3.10
+    low, high = 0, len(sequence)
+    while low < high:
+        middle = (low + high) // 2
+        if key(sequence[middle]) < value:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+class _QuestionPool(Mapping):
+
+    def __init__(self, deck, value):
+        self.deck = deck
+        self.value = value
+
+    def __getitem__(self, question):
+        record = self.deck.find(question)
+        if record < 0:
+            raise KeyError(question)
+        return self.value(record)
+
+    def __contains__(self, question):
+        return self.deck.find(question) >= 0
+
+    def __iter__(self):
+        # Iterate in file order, as required by --all
+        return (self.deck.question(i) for i in range(len(self.deck)))
+
+    def __len__(self):
+        return len(self.deck)
+
+    def items(self):
+        return _QuestionItems(self.deck, self.value)
+
+
+class _QuestionItems(Sequence, ItemsView):
+    # The items of a _QuestionPool, which unlike dict items can be indexed
+
+    def __init__(self, deck, value):
+        self.deck = deck
+        self.value = value
+
+    def __getitem__(self, record):
+        if isinstance(record, slice):
+            return [self[i] for i in range(*record.indices(len(self)))]
+        if not 0 <= record < len(self.deck):
+            raise IndexError(record)
+        return self.deck.question(record), self.value(record)
+
+    def __contains__(self, item):
+        question, value = item
+        record = self.deck.find(question)
+        return record >= 0 and self.value(record) == value
+
+    def __iter__(self):
+        return Sequence.__iter__(self)
+
+    def __len__(self):
+        return len(self.deck)
+
+
+class _SortedAnswers(Sequence):
+
+    def __init__(self, deck):
+        self.deck = deck
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        return self.deck.string(self.deck.answer_order[position])
+
+    def __len__(self):
+        return len(self.deck.answer_order)
+
+
+class _AnswerPositions(Mapping):
+
+    def __init__(self, answers):
+        self.answers = answers
+
+    def __getitem__(self, answer):
+        position = _bisect(
+            range(len(self.answers)), answer, self.answers.__getitem__
+        )
+        if position < len(self.answers) and self.answers[position] == answer:
+            return position
+        raise KeyError(answer)
+
+    def __iter__(self):
+        return iter(self.answers)
+
+    def __len__(self):
+        return len(self.answers)
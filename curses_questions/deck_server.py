@@ -0,0 +1,261 @@
+"""
+A server keeping parsed decks and their answer providers in memory, and a
+client for it, so that runs against a large deck needn't parse it again.
+Clients talk to the server over a Unix domain socket, sending one JSON
+request per line and receiving one JSON response per line.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+from collections.abc import ItemsView, Mapping, Sequence
+
+from curses_questions.question_providers import question_items
+
+# Number of (question, answer) tuples fetched from the server at a time
+PAGE_SIZE = 256
+
+
+def default_socket_path():
+    """
+    Return the path of the default server socket.
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(
+        base, "curses-questions-{uid}.sock".format(uid=os.getuid())
+    )
+
+
+class Deck:
+    """
+    A deck loaded by the server, along with the mtime and size of its
+    source file when it was loaded.
+    """
+
+    __slots__ = ("answer_provider", "questions", "items", "stat")
+
+    def __init__(self, answer_provider, stat):
+        self.answer_provider = answer_provider
+        self.questions = answer_provider.get_all_questions()
+        self.items = question_items(self.questions)
+        self.stat = stat
+
+
+class DeckServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves decks loaded by load, a function taking a dict of options (the
+    path of the deck and how it should be parsed, as sent by DeckClient) and
+    returning an answer provider. Decks are reloaded when their source file
+    changes.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, load):
+        self.load = load
+        self.lock = threading.Lock()
+        # Options, as JSON, to their id, and ids to Decks
+        self.deck_ids = {}
+        self.decks = {}
+        super().__init__(socket_path, DeckRequestHandler)
+
+    def open_deck(self, options):
+        """
+        Return the id of the deck described by options, loading it if it
+        has not been loaded or its source file has changed.
+        """
+        key = json.dumps(options, sort_keys=True)
+        stat = os.stat(options["path"])
+        stat = stat.st_mtime_ns, stat.st_size
+        with self.lock:
+            deck_id = self.deck_ids.setdefault(key, len(self.deck_ids))
+            deck = self.decks.get(deck_id)
+            if deck is None or deck.stat != stat:
+                self.decks[deck_id] = Deck(self.load(options), stat)
+        return deck_id
+
+    def handle_request_line(self, request):
+        op = request["op"]
+        if op == "open":
+            deck_id = self.open_deck(request["options"])
+            return {"id": deck_id, "size": len(self.decks[deck_id].items)}
+        deck = self.decks[request["id"]]
+        if op == "items":
+            return {"items": deck.items[request["start"]:request["stop"]]}
+        elif op == "answers":
+            return {"answers": deck.answer_provider.get_answers(
+                request["question"]
+            )}
+        elif op == "lookup":
+            return {"answer": deck.questions.get(request["question"])}
+        raise ValueError("Unknown request: '{op}'".format(op=op))
+
+
+class DeckRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.handle_request_line(json.loads(line))
+            except (KeyError, ValueError, OSError) as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+def serve(socket_path, load):
+    """
+    Serve decks on the Unix domain socket at socket_path until interrupted,
+    replacing the socket if no server is listening on it.
+    """
+    if os.path.exists(socket_path):
+        try:
+            DeckClient(socket_path).close()
+        except OSError:
+            os.unlink(socket_path)
+        else:
+            raise OSError(
+                "A server is already listening on {path}".format(
+                    path=socket_path
+                )
+            )
+    with DeckServer(socket_path, load) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+
+class DeckClient:
+    """
+    A connection to a DeckServer, which may be shared between threads.
+    """
+
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(socket_path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.rfile = self.sock.makefile("rb")
+        self.lock = threading.Lock()
+
+    def request(self, op, **kwargs):
+        """
+        Send a request to the server and return its response, raising
+        ValueError if the server reports an error.
+        """
+        kwargs["op"] = op
+        with self.lock:
+            self.sock.sendall(json.dumps(kwargs).encode("utf-8") + b"\n")
+            line = self.rfile.readline()
+        if not line:
+            raise OSError("The deck server closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response
+
+    def open_deck(self, options):
+        """
+        Return a RemoteAnswerProvider for the deck described by options.
+        """
+        response = self.request("open", options=options)
+        return RemoteAnswerProvider(self, response["id"], response["size"])
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+class RemoteAnswerProvider:
+    """
+    An answer provider for a deck held by a DeckServer.
+    """
+
+    def __init__(self, client, deck_id, size):
+        self.client = client
+        self.deck_id = deck_id
+        self.question_pool = RemoteQuestionPool(client, deck_id, size)
+
+    def get_all_questions(self):
+        """
+        Return a mapping of questions to their correct answers.
+        """
+        return self.question_pool
+
+    def get_answers(self, chosen_question):
+        return self.client.request(
+            "answers", id=self.deck_id, question=chosen_question
+        )["answers"]
+
+
+class RemoteQuestionPool(Mapping):
+    """
+    A read only mapping of the questions of a deck held by a DeckServer to
+    their answers, which fetches questions from the server as they are
+    needed, PAGE_SIZE at a time.
+    """
+
+    def __init__(self, client, deck_id, size):
+        self.client = client
+        self.deck_id = deck_id
+        self.size = size
+        self.pages = {}
+
+    def item(self, index):
+        page = self.pages.get(index // PAGE_SIZE)
+        if page is None:
+            start = index - index % PAGE_SIZE
+            page = self.pages[index // PAGE_SIZE] = [
+                tuple(item) for item in self.client.request(
+                    "items", id=self.deck_id, start=start,
+                    stop=start + PAGE_SIZE
+                )["items"]
+            ]
+        return page[index % PAGE_SIZE]
+
+    def __getitem__(self, question):
+        answer = self.client.request(
+            "lookup", id=self.deck_id, question=question
+        )["answer"]
+        if answer is None:
+            raise KeyError(question)
+        return answer
+
+    def __iter__(self):
+        return (self.item(i)[0] for i in range(self.size))
+
+    def __len__(self):
+        return self.size
+
+    def items(self):
+        return _RemoteItems(self)
+
+
+class _RemoteItems(Sequence, ItemsView):
+    # The items of a RemoteQuestionPool, which unlike dict items can be
+    # indexed
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if not 0 <= index < len(self.pool):
+            raise IndexError(index)
+        return self.pool.item(index)
+
+    def __contains__(self, item):
+        question, answer = item
+        return self.pool.get(question) == answer
+
+    def __iter__(self):
+        return Sequence.__iter__(self)
+
+    def __len__(self):
+        return len(self.pool)
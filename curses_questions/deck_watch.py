@@ -0,0 +1,275 @@
+"""
+A deck which is reloaded as its file changes. The file is divided into
+blocks of lines, and the checksum of each block is kept along with the
+questions parsed from it. When the file changes, blocks are matched against
+it from the start and from the end, and only the lines between the last
+matching block at the start and the first at the end are parsed again.
+"""
+
+import collections
+import mmap
+import os
+import random
+import zlib
+from operator import itemgetter
+
+from curses_questions.answer_providers import (
+    RandomizedAnswerProvider, PresetAnswerProvider
+)
+from curses_questions.question_providers import FenwickSampler
+from curses_questions.readers import decode_lines, line_blocks
+
+# Roughly the number of bytes in each block, a change to a line means
+# parsing the block(s) containing it again
+WATCH_BLOCK_SIZE = 1 << 16
+
+
+class LineBlock:
+    """
+    A block of whole lines of a deck: its length in bytes, CRC-32 checksum
+    and the questions and values (answers, or lists of answers for preset
+    answers) parsed from it in order.
+    """
+
+    __slots__ = ("length", "checksum", "questions", "values")
+
+    def __init__(self, data, pairs):
+        self.length = len(data)
+        self.checksum = zlib.crc32(data)
+        self.questions = tuple(map(itemgetter(0), pairs))
+        self.values = tuple(map(itemgetter(1), pairs))
+
+
+class WatchedDeck:
+    """
+    Questions parsed from the file at path, which is checked for changes
+    each time a question is drawn from questions(). Changes are applied in
+    place to answer_provider, a RandomizedAnswerProvider or (if preset is
+    True) PresetAnswerProvider, using its update_pool(). parse_pairs is
+    called with an iterable of lines and returns an iterable of (question,
+    answer) or (question, answers) tuples.
+    """
+
+    def __init__(self, path, parse_pairs, preset=False, no_choices=3,
+                 encoding="utf-8", seed=None, block_size=WATCH_BLOCK_SIZE):
+        self.path = path
+        self.parse_pairs = parse_pairs
+        self.preset = preset
+        self.encoding = encoding
+        self.block_size = block_size
+        self.random = random.Random(seed)
+        self.blocks = []
+        # Questions occurring more than once in the file, to the number of
+        # times they occur
+        self.duplicates = {}
+        # Questions to their answers (or lists of answers), shared with the
+        # answer provider and updated through it
+        self.pool = {}
+        self.stat = self.file_stat()
+        with self.file_data() as data:
+            for start, end in line_blocks(data, 0, len(data), block_size):
+                block = self.parse_block(data[start:end])
+                self.blocks.append(block)
+                self.pool.update(zip(block.questions, block.values))
+        if len(self.pool) < sum(len(block.questions) for block in self.blocks):
+            self.duplicates = {
+                question: count for question, count in collections.Counter(
+                    question for block in self.blocks
+                    for question in block.questions
+                ).items() if count > 1
+            }
+        # Providers swap an empty pool for a placeholder question, so the
+        # pool is taken back from the provider
+        if preset:
+            self.answer_provider = PresetAnswerProvider(self.pool)
+            self.pool = self.answer_provider.question_to_answers_map
+        else:
+            self.answer_provider = RandomizedAnswerProvider(
+                self.pool, no_choices
+            )
+            self.pool = self.answer_provider.question_pool
+        # Remove any placeholder question, which is never drawn, and count
+        # the answers of a RandomizedAnswerProvider now rather than on the
+        # first change
+        self.answer_provider.update_pool(
+            () if any(block.questions for block in self.blocks)
+            else list(self.pool)
+        )
+        self.build_sampler()
+
+    def file_stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def file_data(self):
+        """
+        Return a context manager giving the contents of the file, memory
+        mapped unless it's empty.
+        """
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files can't be memory mapped
+                return memoryview(b"")
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def parse_block(self, data):
+        return LineBlock(
+            data, list(self.parse_pairs(decode_lines(data, self.encoding)))
+        )
+
+    def build_sampler(self):
+        self.sampler = FenwickSampler(
+            [len(block.questions) for block in self.blocks]
+        )
+        self.sampler.random = self.random
+
+    def changed_blocks(self, data):
+        """
+        Return a (first, last, start, end) tuple, blocks first to last (not
+        inclusive) having changed and their contents now being
+        data[start:end]. Blocks before and after them are unchanged, though
+        those after may have moved.
+        """
+        view = memoryview(data)
+        size = len(view)
+        first = start = 0
+        for block in self.blocks:
+            end = start + block.length
+            # The block must still end at the end of a line
+            if end > size or (end < size and view[end - 1] != ord("\n")) \
+               or zlib.crc32(view[start:end]) != block.checksum:
+                break
+            first += 1
+            start = end
+        last, end = len(self.blocks), size
+        while last > first:
+            block = self.blocks[last - 1]
+            block_start = end - block.length
+            # The block must still start at the start of a line
+            if block_start < start or \
+               (block_start > start and view[block_start - 1] != ord("\n")) \
+               or zlib.crc32(view[block_start:end]) != block.checksum:
+                break
+            last -= 1
+            end = block_start
+        view.release()
+        return first, last, start, end
+
+    def refresh(self):
+        """
+        Apply any changes to the file since it was last read, returning
+        True if it had changed.
+        """
+        try:
+            stat = self.file_stat()
+        except OSError:
+            # The file may be being replaced, try again next time
+            return False
+        if stat == self.stat:
+            return False
+        self.stat = stat
+        with self.file_data() as data:
+            first, last, start, end = self.changed_blocks(data)
+            new_blocks = [
+                self.parse_block(data[block_start:block_end])
+                for block_start, block_end in line_blocks(
+                    data, start, end, self.block_size
+                )
+            ]
+        old_blocks = self.blocks[first:last]
+        self.blocks[first:last] = new_blocks
+        self.apply_changes(old_blocks, new_blocks)
+        self.build_sampler()
+        return True
+
+    def apply_changes(self, old_blocks, new_blocks):
+        """
+        Update the answer provider for old_blocks having been replaced by
+        new_blocks.
+        """
+        removed, added = collections.Counter(), collections.Counter()
+        values = {}
+        # The values questions occurring more than once take in the old and
+        # new blocks, in order
+        old_occurrences = collections.defaultdict(list)
+        new_occurrences = collections.defaultdict(list)
+        for blocks, counter, occurrences in (
+                (old_blocks, removed, old_occurrences),
+                (new_blocks, added, new_occurrences)):
+            for block in blocks:
+                counter.update(block.questions)
+                if self.duplicates:
+                    for question, value in zip(block.questions, block.values):
+                        if question in self.duplicates:
+                            occurrences[question].append(value)
+        for block in new_blocks:
+            values.update(zip(block.questions, block.values))
+        removed_questions, added_pairs, unresolved = [], [], []
+        for question in set(removed).union(added):
+            if question in self.duplicates and \
+               old_occurrences.get(question) == new_occurrences.get(question):
+                # Neither its number of occurrences nor answer has changed
+                continue
+            count = self.duplicates.get(question, 1) \
+                if question in self.pool else 0
+            count += added[question] - removed[question]
+            if count > 1:
+                self.duplicates[question] = count
+            else:
+                self.duplicates.pop(question, None)
+            if count == 0:
+                removed_questions.append(question)
+            elif count > added[question]:
+                # The question also occurs outside the changed blocks, the
+                # last occurrence in the file gives its answer
+                unresolved.append(question)
+            elif question not in self.pool or \
+                    self.pool[question] != values[question]:
+                # Most questions in changed blocks are themselves unchanged
+                added_pairs.append((question, values[question]))
+        if unresolved:
+            added_pairs.extend(
+                (question, value)
+                for question, value in self.last_values(unresolved).items()
+                if question not in self.pool or self.pool[question] != value
+            )
+        self.answer_provider.update_pool(removed_questions, added_pairs)
+
+    def last_values(self, questions):
+        """
+        Return a dict of questions to the values of their last occurrences
+        in the file, searching blocks from the end.
+        """
+        needed, values = set(questions), {}
+        for block in reversed(self.blocks):
+            if needed.isdisjoint(block.questions):
+                continue
+            for question, value in zip(reversed(block.questions),
+                                       reversed(block.values)):
+                if question in needed:
+                    needed.discard(question)
+                    values[question] = value
+            if not needed:
+                break
+        return values
+
+    def correct_answer(self, question):
+        value = self.pool[question]
+        return value[0] if self.preset else value
+
+    def questions(self, error_question=("???", "???")):
+        """
+        Generator which endlessly yields random (question, correct_answer)
+        tuples, applying changes to the file before each. If there are no
+        questions error_question is yielded instead.
+        """
+        while True:
+            self.refresh()
+            if self.sampler.total <= 0:
+                yield error_question
+                continue
+            block = self.blocks[self.sampler.draw()]
+            question = block.questions[
+                self.random.randrange(len(block.questions))
+            ]
+            yield question, self.correct_answer(question)
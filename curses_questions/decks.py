@@ -0,0 +1,163 @@
+"""
+Functions for reading several decks at once, which may each be in a
+different format, and an answer provider combining them.
+"""
+
+import fnmatch
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from curses_questions.answer_providers import (
+    RandomizedAnswerProvider, PresetAnswerProvider
+)
+from curses_questions.anki import is_apkg, read_apkg_pairs
+from curses_questions.deck_cache import is_compiled_deck, CompiledDeck
+from curses_questions.question_providers import question_items
+from curses_questions.readers import open_lines
+
+# Deck formats, each paired with the value it takes
+FORMATS = ("delimiter", "regex", "preset")
+
+
+def deck_option(path, options, default):
+    """
+    Return the value to use for the deck at path, options being a list of
+    (pattern, value) tuples whose glob patterns are matched against the file
+    name of path, with or without its extension. The last matching pattern
+    wins.
+    """
+    name = os.path.basename(path)
+    names = name, os.path.splitext(name)[0]
+    value = default
+    for pattern, option in options:
+        if any(fnmatch.fnmatch(n, pattern) for n in names):
+            value = option
+    return value
+
+
+def read_deck(path, deck_format, fields=None, encoding="utf-8"):
+    """
+    Read the deck at path, returning a ("pairs", OrderedDict of questions to
+    their answers) tuple, or a ("records", list of (question, answers)
+    tuples) tuple for decks in the "preset" format. deck_format is a
+    (format, value) tuple, the value being the delimiter of "delimiter" and
+    "preset" decks and the regex of "regex" decks. Anki .apkg files and
+    compiled decks are recognised whatever deck_format is, fields being the
+    1 based note fields to read from .apkg files.
+    """
+    kind, value = deck_format
+    if is_apkg(path):
+        question_field, answer_field = fields or (0, 0)
+        return "pairs", OrderedDict(read_apkg_pairs(
+            path, question_field - 1, answer_field - 1
+        ))
+    if is_compiled_deck(path):
+        deck = CompiledDeck(path)
+        try:
+            if kind == "preset":
+                return "records", list(deck.question_to_answers_map().items())
+            return "pairs", OrderedDict(deck.question_pool().items())
+        finally:
+            deck.close()
+    with open_lines(path, encoding) as f:
+        if kind == "preset":
+            return "records", list(PresetAnswerProvider.iter_records(f, value))
+        elif kind == "regex":
+            return "pairs", OrderedDict(
+                RandomizedAnswerProvider.iter_pairs_regex(f, value)
+            )
+        return "pairs", OrderedDict(
+            RandomizedAnswerProvider.iter_pairs(f, value)
+        )
+
+
+def read_decks(paths, deck_formats, fields=None, encoding="utf-8",
+               processes=None):
+    """
+    Read the decks at paths in parallel worker processes, returning a list
+    of the results of read_deck() for each, in the order of paths.
+    deck_formats is a list of the format of each deck.
+    """
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(read_deck, path, deck_format, fields, encoding)
+            for path, deck_format in zip(paths, deck_formats)
+        ]
+        return [future.result() for future in futures]
+
+
+class MultiDeckAnswerProvider:
+    """
+    Provides answers for questions from several decks, each with their own
+    answer provider. Questions appearing in more than one deck belong to the
+    first. Incorrect answers are drawn from the question's own deck, or if
+    shared_answers is True, from the answers of every deck not using preset
+    answers. Empty decks have an answer provider of None.
+    """
+
+    def __init__(self, answer_providers, shared_answers=False,
+                 no_choices=3):
+        self.answer_providers = answer_providers
+        # Questions to the index of their deck, and the (question, answer)
+        # tuples of each deck
+        self.question_decks = {}
+        self.deck_items = []
+        for deck, answer_provider in enumerate(answer_providers):
+            items = []
+            pool = answer_provider.get_all_questions() \
+                if answer_provider is not None else ()
+            for question, answer in question_items(pool):
+                if question not in self.question_decks:
+                    self.question_decks[question] = deck
+                    items.append((question, answer))
+            self.deck_items.append(items)
+        self.shared_provider = None
+        if shared_answers:
+            self.shared_provider = RandomizedAnswerProvider(OrderedDict(
+                item for answer_provider, items in zip(
+                    answer_providers, self.deck_items
+                ) if isinstance(answer_provider, RandomizedAnswerProvider)
+                for item in items
+            ), no_choices)
+
+    @classmethod
+    def from_decks(cls, decks, shared_answers=False, no_choices=3):
+        """
+        Create a provider from the results of read_deck() for each deck.
+        """
+        answer_providers = []
+        for kind, data in decks:
+            if not data:
+                answer_providers.append(None)
+            elif kind == "records":
+                answer_providers.append(
+                    PresetAnswerProvider.from_records(data)
+                )
+            else:
+                answer_providers.append(
+                    RandomizedAnswerProvider(data, no_choices)
+                )
+        return cls(answer_providers, shared_answers, no_choices)
+
+    def get_all_questions(self):
+        """
+        Return a mapping of questions to their correct answers.
+        """
+        return OrderedDict(
+            item for items in self.deck_items for item in items
+        )
+
+    def get_answers(self, chosen_question):
+        if chosen_question not in self.question_decks:
+            raise ValueError(
+                "chosen_question: '{question}' is not in any deck"
+                .format(question=chosen_question)
+            )
+        answer_provider = self.answer_providers[
+            self.question_decks[chosen_question]
+        ]
+        if self.shared_provider is not None \
+           and isinstance(answer_provider, RandomizedAnswerProvider):
+            answer_provider = self.shared_provider
+        return answer_provider.get_answers(chosen_question)
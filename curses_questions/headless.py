@@ -0,0 +1,177 @@
+"""
+Run questions_loop without a terminal, against a fake stdscr and a scripted
+stream of key presses.
+"""
+
+import asyncio
+import contextlib
+import curses
+import time
+from unittest import mock
+
+from curses_questions.question_loop import questions_loop
+
+
+class FakeWindow:
+    """
+    An in memory stand in for a curses window, recording what is drawn to
+    it. Windows created with derwin() share their parent's cells.
+    """
+
+    def __init__(self, nlines, ncols, begin_y=0, begin_x=0, parent=None):
+        self.nlines = nlines
+        self.ncols = ncols
+        self.begin_y = begin_y
+        self.begin_x = begin_x
+        if parent is None:
+            self.root = self
+            self.cells = [[" "] * ncols for _ in range(nlines)]
+            # Counters of the work done drawing to the window
+            self.chars_drawn = 0
+            self.refreshes = 0
+            self.updates = 0
+        else:
+            self.root = parent.root
+            self.cells = parent.cells
+        self.y = self.x = 0
+
+    def getmaxyx(self):
+        return self.nlines, self.ncols
+
+    def getyx(self):
+        return self.y, self.x
+
+    def move(self, y, x):
+        if not (0 <= y < self.nlines and 0 <= x < self.ncols):
+            raise curses.error("move() returned ERR")
+        self.y, self.x = y, x
+
+    def addstr(self, *args):
+        if len(args) >= 3 and isinstance(args[0], int):
+            y, x, text = args[:3]
+            self.move(y, x)
+        else:
+            text = args[0]
+        for c in text:
+            if self.y >= self.nlines:
+                raise curses.error("addstr() returned ERR")
+            self.cells[self.begin_y + self.y][self.begin_x + self.x] = c
+            self.root.chars_drawn += 1
+            self.x += 1
+            if self.x >= self.ncols:
+                self.y, self.x = self.y + 1, 0
+
+    def addnstr(self, *args):
+        if len(args) >= 4 and isinstance(args[0], int):
+            y, x, text, n = args[:4]
+            self.addstr(y, x, text[:n])
+        else:
+            self.addstr(args[0][:args[1]])
+
+    def erase(self):
+        for row in self.cells[self.begin_y:self.begin_y + self.nlines]:
+            row[self.begin_x:self.begin_x + self.ncols] = " " * self.ncols
+        self.y = self.x = 0
+
+    clear = erase
+
+    def border(self, *args):
+        top = "+" + "-" * (self.ncols - 2) + "+"
+        self.cells[0][:] = top
+        self.cells[self.nlines - 1][:] = top
+        for row in self.cells[1:self.nlines - 1]:
+            row[0] = row[-1] = "|"
+
+    def derwin(self, nlines, ncols, begin_y, begin_x):
+        if nlines <= 0 or ncols <= 0 or begin_y + nlines > self.nlines \
+           or begin_x + ncols > self.ncols:
+            raise curses.error("derwin() returned ERR")
+        return FakeWindow(
+            nlines, ncols, self.begin_y + begin_y, self.begin_x + begin_x,
+            self
+        )
+
+    def noutrefresh(self):
+        self.root.refreshes += 1
+
+    def refresh(self):
+        self.noutrefresh()
+        self.root.updates += 1
+
+    def nodelay(self, flag):
+        pass
+
+    def keypad(self, flag):
+        pass
+
+    def lines(self):
+        """
+        Return the text on screen as a list of lines.
+        """
+        return ["".join(row) for row in self.cells]
+
+
+class ScriptedKeys:
+    """
+    Supplies key presses from a script in place of a KeyReader, recording
+    how long the question loop took to handle each one. Once the script
+    runs out "q" is pressed.
+    """
+
+    def __init__(self, keys):
+        self.keys = [
+            ord(key) if isinstance(key, str) else key for key in keys
+        ]
+        self.position = 0
+        # Seconds taken to handle each key
+        self.latencies = []
+        self.last_key_time = None
+
+    async def get(self):
+        now = time.perf_counter()
+        if self.last_key_time is not None:
+            self.latencies.append(now - self.last_key_time)
+        if self.position >= len(self.keys):
+            return ord("q")
+        key = self.keys[self.position]
+        self.position += 1
+        # Yield to the event loop, as waiting for a real key press would
+        await asyncio.sleep(0)
+        self.last_key_time = time.perf_counter()
+        return key
+
+
+@contextlib.contextmanager
+def fake_curses():
+    """
+    Context manager replacing the module level curses functions which
+    require a terminal with no-ops.
+    """
+    with contextlib.ExitStack() as stack:
+        for name in (
+                "init_color", "use_default_colors", "curs_set", "init_pair",
+                "doupdate"):
+            stack.enter_context(
+                mock.patch.object(curses, name, lambda *args: None)
+            )
+        stack.enter_context(
+            mock.patch.object(curses, "color_pair", lambda n: n << 8)
+        )
+        yield
+
+
+def run_headless(question_gen, answer_provider, keys, preceding_str="",
+                 size=(24, 80), answer_callback=None, answer_log=None):
+    """
+    Run questions_loop against a FakeWindow of the given size, pressing keys
+    (characters or curses key codes) in turn. Returns the FakeWindow and the
+    ScriptedKeys used.
+    """
+    stdscr = FakeWindow(*size)
+    key_reader = ScriptedKeys(keys)
+    with fake_curses():
+        questions_loop(
+            stdscr, question_gen, answer_provider, preceding_str,
+            answer_callback, key_reader, answer_log
+        )
+    return stdscr, key_reader
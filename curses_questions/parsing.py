@@ -0,0 +1,94 @@
+"""
+Parse large input files in parallel, by splitting them into chunks at line
+boundaries and parsing each chunk in a separate process.
+"""
+
+import functools
+import io
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from curses_questions.answer_providers import (
+    RandomizedAnswerProvider, PresetAnswerProvider
+)
+
+# Files smaller than this are not worth splitting
+MIN_CHUNK_SIZE = 1 << 22
+
+# Compiles each regex once per worker process
+_compile = functools.lru_cache(maxsize=None)(re.compile)
+
+
+def chunk_boundaries(path, no_chunks, min_chunk_size=MIN_CHUNK_SIZE):
+    """
+    Return a list of (start, end) byte offsets splitting the file at path
+    into at most no_chunks chunks, each chunk starting at the beginning of a
+    line.
+    """
+    size = os.path.getsize(path)
+    no_chunks = max(1, min(no_chunks, size // min_chunk_size))
+    boundaries = [0]
+    with open(path, "rb") as f:
+        for i in range(1, no_chunks):
+            f.seek(max(size * i // no_chunks, boundaries[-1]))
+            f.readline()
+            if f.tell() >= size:
+                break
+            boundaries.append(f.tell())
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _parse_chunk(path, start, end, encoding, delimiter, regex,
+                 preset_answers):
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    # newline=None gives the same newline translation as reading the file
+    # in text mode
+    lines = io.StringIO(text, newline=None)
+    if preset_answers:
+        return list(PresetAnswerProvider.iter_records(lines, delimiter))
+    elif regex is not None:
+        return list(
+            RandomizedAnswerProvider.iter_pairs_regex(lines, _compile(regex))
+        )
+    else:
+        return list(RandomizedAnswerProvider.iter_pairs(lines, delimiter))
+
+
+def parse_file(
+        path,
+        delimiter="\t",
+        regex=None,
+        preset_answers=False,
+        encoding="utf-8",
+        processes=None,
+):
+    """
+    Parse the file at path in parallel and return an OrderedDict mapping
+    questions to their correct answer (or to their list of answers if
+    preset_answers is True). The result is the same as parsing the file
+    sequentially: questions are in file order and later duplicates of a
+    question overwrite earlier ones.
+    """
+    chunks = chunk_boundaries(path, processes or os.cpu_count() or 1)
+    parsed = OrderedDict()
+    if len(chunks) == 1:
+        parsed.update(_parse_chunk(
+            path, 0, chunks[0][1], encoding, delimiter, regex, preset_answers
+        ))
+        return parsed
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        futures = [
+            executor.submit(
+                _parse_chunk, path, start, end, encoding, delimiter, regex,
+                preset_answers
+            ) for start, end in chunks
+        ]
+        # Merge in file order
+        for future in futures:
+            parsed.update(future.result())
+    return parsed
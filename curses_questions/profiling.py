@@ -0,0 +1,220 @@
+"""
+Opt in timing of the hot paths of the program, aggregated into latency
+histograms and written to a file on exit.
+"""
+
+import contextlib
+import curses
+import functools
+import inspect
+import os
+import threading
+import time
+
+from curses_questions import widgets
+from curses_questions.answer_providers import (
+    RandomizedAnswerProvider, PresetAnswerProvider
+)
+
+# Environment variable naming a file to write a profile to, equivalent to
+# passing --profile
+PROFILE_ENV = "CURSES_QUESTIONS_PROFILE"
+_MISSING = object()
+
+
+class Histogram:
+    """
+    Latencies bucketed by powers of two of microseconds, bucket i holding
+    latencies of at least 2^(i-1)us and less than 2^i us.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = []
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        bucket = int(seconds * 1e6).bit_length()
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+
+    def percentile(self, fraction):
+        """
+        Return an upper bound on the latency below which fraction of the
+        recorded latencies fall, in seconds.
+        """
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return min(self.max, (1 << bucket) / 1e6)
+        return self.max
+
+    def summary(self, name):
+        lines = [
+            "{name}: n={n} total={total:.3f}s mean={mean:.1f}us "
+            "min={min:.1f}us p50<={p50:.1f}us p90<={p90:.1f}us "
+            "p99<={p99:.1f}us max={max:.1f}us".format(
+                name=name,
+                n=self.count,
+                total=self.total,
+                mean=self.total / self.count * 1e6,
+                min=self.min * 1e6,
+                p50=self.percentile(0.5) * 1e6,
+                p90=self.percentile(0.9) * 1e6,
+                p99=self.percentile(0.99) * 1e6,
+                max=self.max * 1e6,
+            )
+        ]
+        peak = max(self.buckets)
+        for bucket, count in enumerate(self.buckets):
+            if count:
+                lines.append("  <{limit:>10}us {count:>8} {bar}".format(
+                    limit=1 << bucket,
+                    count=count,
+                    bar="#" * max(1, count * 40 // peak),
+                ))
+        return "\n".join(lines)
+
+
+class Profiler:
+    """
+    Records how long named operations take. A disabled Profiler leaves the
+    functions given to instrument() untouched and returns iterables given
+    to wrap_iter() as they are, so costs nothing on the hot paths.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self.lock = threading.Lock()
+        # (owner, attribute, original value) of each instrumented function
+        self.patched = []
+
+    def record(self, name, seconds):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].record(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """
+        Context manager recording how long its body takes as name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.record(name, time.perf_counter() - start)
+
+    def instrument(self, owner, attribute, name):
+        """
+        Replace the function attribute of owner (a class or module) with one
+        recording how long each call takes as name.
+        """
+        if not self.enabled:
+            return
+        function = getattr(owner, attribute)
+        # Class and static methods are rewrapped in their descriptor, so
+        # classmethods still receive the class
+        descriptor = inspect.getattr_static(owner, attribute)
+        if isinstance(descriptor, (classmethod, staticmethod)):
+            function = descriptor.__func__
+        record = self.record
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, perf_counter() - start)
+
+        self.patched.append(
+            (owner, attribute, vars(owner).get(attribute, _MISSING))
+        )
+        if isinstance(descriptor, (classmethod, staticmethod)):
+            timed = type(descriptor)(timed)
+        setattr(owner, attribute, timed)
+
+    def wrap_iter(self, name, iterable):
+        """
+        Return an iterator over iterable recording how long each item takes
+        to produce as name.
+        """
+        if not self.enabled:
+            return iterable
+        return self.timed_iter(name, iter(iterable))
+
+    def timed_iter(self, name, iterator):
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(name, time.perf_counter() - start)
+            yield item
+
+    def instrument_hot_paths(self):
+        """
+        Instrument parsing, answer providers, widget drawing and terminal
+        refreshes.
+        """
+        self.instrument(RandomizedAnswerProvider, "parse_from_iter", "parse")
+        self.instrument(
+            RandomizedAnswerProvider, "parse_from_iter_regex", "parse"
+        )
+        self.instrument(PresetAnswerProvider, "parse_from_iter", "parse")
+        self.instrument(
+            RandomizedAnswerProvider, "get_answers", "provider.get_answers"
+        )
+        self.instrument(
+            PresetAnswerProvider, "get_answers", "provider.get_answers"
+        )
+        self.instrument(widgets, "wrap_text", "widget.wrap_text")
+        self.instrument(widgets.QuestionWidget, "draw", "widget.question")
+        self.instrument(widgets.AnswerWidget, "draw", "widget.answers")
+        self.instrument(
+            widgets.RunningTotalWidget, "draw", "widget.running_total"
+        )
+        self.instrument(widgets.Renderer, "render", "render")
+        self.instrument(curses, "doupdate", "refresh")
+
+    def restore(self):
+        """
+        Undo instrument(), in reverse order.
+        """
+        while self.patched:
+            owner, attribute, original = self.patched.pop()
+            if original is _MISSING:
+                delattr(owner, attribute)
+            else:
+                setattr(owner, attribute, original)
+
+    def summary(self):
+        return "\n".join(
+            self.histograms[name].summary(name)
+            for name in sorted(self.histograms)
+        )
+
+    def write(self, path):
+        """
+        Write a summary of the recorded timings to the file at path.
+        """
+        with open(path, "w") as f:
+            print("# curses-questions profile, pid {pid}".format(
+                pid=os.getpid()
+            ), file=f)
+            print(self.summary(), file=f)
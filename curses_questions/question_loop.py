@@ -0,0 +1,174 @@
+"""
+The curses question loop: asks questions, reads key presses and keeps the
+running total.
+"""
+
+import asyncio
+import curses
+import time
+
+from curses_questions.question_providers import prepare_question
+from curses_questions.widgets import (
+    QuestionWidget, AnswerWidget, RunningTotalWidget, Renderer
+)
+
+
+def questions_loop(stdscr, question_gen, answer_provider, preceding_str,
+                   answer_callback=None, key_reader=None, answer_log=None):
+    # Sets bg colour to black, curses.wrapper resets this on termination
+    curses.init_color(0, 0, 0, 0)
+    # We must call this to be able to use -1 in the next command
+    curses.use_default_colors()
+    # Hide the cursor
+    curses.curs_set(0)
+    # -1 sets the text bg colour to the current bg colour of the terminal
+    curses.init_pair(1, curses.COLOR_CYAN, -1)
+    curses.init_pair(2, curses.COLOR_BLUE, -1)
+    curses.init_pair(3, curses.COLOR_GREEN, -1)
+    curses.init_pair(4, curses.COLOR_RED, -1)
+    curses.init_pair(5, curses.COLOR_YELLOW, -1)
+
+    question_widget = QuestionWidget("???", preceding_str, curses.color_pair(1), curses.color_pair(2), 0)
+    # The answer window starts inside the border, hence indent 5 not 6
+    answer_widget = AnswerWidget(
+        [], 3, 4, curses.A_DIM, curses.A_BOLD, indent=5
+    )
+    running_total_widget = RunningTotalWidget()
+    renderer = Renderer(
+        stdscr, question_widget, answer_widget, running_total_widget
+    )
+    renderer.resize()
+    asyncio.run(run_questions(
+        stdscr, iter(question_gen), answer_provider, renderer,
+        answer_callback, key_reader, answer_log
+    ))
+
+
+class KeyReader:
+    """
+    Reads key presses from stdscr without blocking the event loop.
+    """
+
+    # Seconds between checks for keys which don't arrive through stdin,
+    # namely KEY_RESIZE which ncurses queues from its SIGWINCH handler
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, stdscr):
+        self.stdscr = stdscr
+        self.keys = asyncio.Queue()
+        stdscr.nodelay(True)
+
+    def read_keys(self):
+        while True:
+            c = self.stdscr.getch()
+            if c == -1:
+                break
+            self.keys.put_nowait(c)
+
+    async def get(self):
+        """
+        Return the next key pressed.
+        """
+        while self.keys.empty():
+            self.read_keys()
+            if self.keys.empty():
+                try:
+                    await asyncio.wait_for(
+                        self.keys_available(), self.POLL_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        return self.keys.get_nowait()
+
+    async def keys_available(self):
+        # Wait until stdin (the terminal) is readable
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        loop.add_reader(0, readable.set_result, None)
+        try:
+            await readable
+        finally:
+            loop.remove_reader(0)
+
+
+async def run_questions(stdscr, question_iter, answer_provider, renderer,
+                        answer_callback=None, key_reader=None,
+                        answer_log=None):
+    """
+    Ask questions until they run out or the user quits. The next question
+    and its answers are prepared in a background thread whilst the answer
+    to the current question is shown, so moving to the next question
+    doesn't wait on answer_provider. If given, answer_callback is called
+    with the question, its correct answer and the chosen answer each time a
+    question is answered, before the next question is taken from
+    question_iter, and answer_log's record() with those and the seconds
+    taken to answer. Keys are read from key_reader, which defaults to a KeyReader of
+    stdscr.
+    """
+    loop = asyncio.get_running_loop()
+    keys = key_reader or KeyReader(stdscr)
+    question_widget = renderer.question_widget
+    answer_widget = renderer.answer_widget
+    running_total_widget = renderer.running_total_widget
+    next_question = loop.run_in_executor(
+        None, prepare_question, question_iter, answer_provider
+    )
+    question_no = 0
+    while True:
+        prepared = await next_question
+        if prepared is None:
+            return
+        question_no += 1
+        question, correct_answer, answers = prepared
+        # Print out the question
+        question_widget.next_question(question)
+
+        # Print out the answers
+        answer_widget.clear_coloured_answers()
+        answer_widget.answers = answers
+
+        renderer.render(question_no % 2)
+        asked = time.perf_counter()
+        # Here we wait for user input and react accordingly
+        answer_chosen = False
+        while True:
+            c = await keys.get()
+            if chr(c) == "q":  # User has quit
+                return
+            elif c == curses.KEY_RESIZE:  # We redraw on resize
+                renderer.resize()
+                renderer.render(question_no % 2)
+            elif c in (curses.KEY_NPAGE, curses.KEY_PPAGE):  # Scroll answers
+                page = max(1, answer_widget.page_height - 1)
+                answer_widget.scroll_by(
+                    page if c == curses.KEY_NPAGE else -page
+                )
+                renderer.render(question_no % 2)
+            elif answer_chosen:  # User has gone to next question
+                answer_chosen = False
+                break
+            elif chr(c).isdigit() and 1 <= int(chr(c)) <= len(answers):
+                answer_chosen = True
+                response_time = time.perf_counter() - asked
+                chosen_answer = answers[int(chr(c)) - 1]
+                answer_widget.add_green_answer(
+                    answers.index(correct_answer) + 1
+                )
+                if chosen_answer == correct_answer:
+                    running_total_widget.increment(True)
+                else:
+                    answer_widget.add_red_answer(int(chr(c)))
+                    running_total_widget.increment(False)
+                # Only the recoloured answers and running total are redrawn
+                renderer.render(question_no % 2)
+                if answer_callback is not None:
+                    answer_callback(question, correct_answer, chosen_answer)
+                if answer_log is not None:
+                    answer_log.record(
+                        question, correct_answer, chosen_answer, response_time
+                    )
+                # Question generators such as the scheduler take the answer
+                # into account when choosing the next question
+                next_question = loop.run_in_executor(
+                    None, prepare_question, question_iter, answer_provider
+                )
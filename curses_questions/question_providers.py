@@ -1,35 +1,288 @@
+import collections
+import itertools
+import math
 import random
+import threading
+from collections.abc import Mapping, Sequence
+
+
+class IndexSampler:
+    """
+    Draws random indices into a sequence of a given size, in O(1) time
+    per draw.
+    """
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.random = random.Random(seed)
+
+    def with_replacement(self):
+        """
+        Generator which endlessly yields indices chosen uniformly at random.
+        """
+        randrange = self.random.randrange
+        while True:
+            yield randrange(self.size)
+
+    def without_replacement(self):
+        """
+        Generator which yields every index once in a random order. This is a
+        Fisher-Yates shuffle performed lazily, only the positions which have
+        been swapped are stored.
+        """
+        randrange = self.random.randrange
+        swapped = {}
+        for remaining in range(self.size, 0, -1):
+            i, last = randrange(remaining), remaining - 1
+            index = swapped.get(i, i)
+            swapped[i] = swapped.pop(last, last)
+            yield index
+
+
+def question_items(question_pool):
+    """
+    Return the items of question_pool as a sequence of (question, answer)
+    tuples, question_pool may be a mapping or anything which is a valid
+    argument to dict(). Mappings whose items() are already a sequence (for
+    example compiled decks) are not copied.
+    """
+    if isinstance(question_pool, Mapping):
+        items = question_pool.items()
+        return items if isinstance(items, Sequence) else list(items)
+    return list(dict(question_pool).items())
 
 
 def randomized_question_generator(
         question_pool,
         no_questions,
-        with_replacement=False
+        with_replacement=False,
+        seed=None
 ):
     """
     Generator which yields <no_questions> questions from the specified
     question_pool (which should be a valid argument to dict(), ie consist of
-    (question, answer) tuples). If with_replacement is True and
+    (question, answer) tuples). If with_replacement is False and
     no_questions > len(questions_pool), the generator will yield
-    len(question_pool) items.
+    len(question_pool) items. seed may be given to make the order in which
+    questions are yielded reproducible.
     """
-    question_pool = dict(question_pool)
+    items = question_items(question_pool)
+    if not items:
+        return
+    sampler = IndexSampler(len(items), seed)
     if with_replacement:
-        for i in range(no_questions):
-            yield random.choice(sorted(question_pool.items()))
+        indices = sampler.with_replacement()
     else:
-        no_questions = min(len(question_pool), no_questions)
-        chosen_questions = random.sample(sorted(question_pool.items()), no_questions)
-        for question in chosen_questions:
-            yield question
+        indices = sampler.without_replacement()
+    for index in itertools.islice(indices, no_questions):
+        yield items[index]
 
 
-def inf_question_generator(question_pool, error_question=("???", "???")):
+def inf_question_generator(
+        question_pool, error_question=("???", "???"), seed=None):
     """
     Generator which will yield random questions from a pool continuously.
     If the pool is empty error_question is yielded instead.
     """
-    question_pool = dict(question_pool)
-    items = list(question_pool.items())
+    items = question_items(question_pool)
+    if not items:
+        while True:
+            yield error_question
+    for index in IndexSampler(len(items), seed).with_replacement():
+        yield items[index]
+
+
+def weighted_question_generator(
+        deck_items, weights, no_questions=None, with_replacement=False,
+        seed=None):
+    """
+    Generator which yields questions from several decks, deck_items being a
+    list of sequences of (question, answer) tuples per deck and weights a
+    list of positive integer weights per deck. The chance of a question
+    being chosen is proportional to its deck's weight, so with equal weights
+    every question is equally likely. Questions are yielded without
+    replacement unless with_replacement is True, and endlessly if
+    no_questions is None.
+    """
+    seeds = random.Random(seed)
+    indices = []
+    for items in deck_items:
+        sampler = IndexSampler(len(items), seeds.random())
+        indices.append(
+            sampler.with_replacement() if with_replacement
+            else sampler.without_replacement()
+        )
+    remaining = [len(items) for items in deck_items]
+    decks = FenwickSampler(
+        [weight * size for weight, size in zip(weights, remaining)],
+        seeds.random()
+    )
+    draws = itertools.count() if no_questions is None else range(no_questions)
+    for _ in draws:
+        if decks.total <= 0:
+            return
+        deck = decks.draw()
+        yield deck_items[deck][next(indices[deck])]
+        if not with_replacement:
+            remaining[deck] -= 1
+            decks.update(deck, weights[deck] * remaining[deck])
+
+
+def reservoir_sample(iterable, k):
+    """
+    Return a list of k items chosen uniformly at random from iterable (or
+    all of its items if it has fewer than k) whilst consuming it lazily and
+    holding at most k items in memory. This is "Algorithm L" (Li, 1994),
+    which skips over items between replacements rather than drawing a
+    random number per item.
+    """
+    iterator = iter(iterable)
+    reservoir = list(itertools.islice(iterator, k))
+    if len(reservoir) < k or k == 0:
+        return reservoir
+    w = math.exp(math.log(1 - random.random()) / k)
     while True:
-        yield random.choice(items) if items else error_question
+        skip = math.floor(math.log(1 - random.random()) / math.log(1 - w))
+        try:
+            item = next(itertools.islice(iterator, skip, None))
+        except StopIteration:
+            return reservoir
+        reservoir[random.randrange(k)] = item
+        w *= math.exp(math.log(1 - random.random()) / k)
+
+
+class FenwickSampler:
+    """
+    Draws indices with probability proportional to integer weights, which
+    may be changed after construction. A Fenwick (binary indexed) tree over
+    the weights makes both draws and weight updates O(log n).
+    """
+
+    def __init__(self, weights, seed=None):
+        self.weights = list(weights)
+        self.random = random.Random(seed)
+        # tree[i] holds the sum of weights (i - (i & -i), i], 1 based
+        self.tree = [0] + self.weights
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+        self.total = sum(self.weights)
+        self.top_bit = 1 << (len(self.weights).bit_length() - 1) \
+            if self.weights else 0
+
+    def update(self, index, weight):
+        """
+        Set the weight of index to weight.
+        """
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        self.total += delta
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def draw(self):
+        """
+        Return an index chosen with probability weight / total weight.
+        """
+        if self.total <= 0:
+            raise ValueError("All weights are zero")
+        target = self.random.randrange(self.total)
+        # Descend the tree to find the first index whose prefix sum exceeds
+        # target
+        position, step = 0, self.top_bit
+        while step:
+            next_position = position + step
+            if next_position < len(self.tree) \
+               and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            step >>= 1
+        return position
+
+
+class AdaptiveQuestionGenerator:
+    """
+    Endlessly yields questions from a pool, choosing questions answered
+    incorrectly more often. Each question starts with weight
+    INITIAL_WEIGHT, which doubles when it is answered incorrectly and
+    halves when answered correctly, within [MIN_WEIGHT, MAX_WEIGHT].
+    If no_repeat_window is given, a question is not yielded again until at
+    least that many other questions have been.
+    """
+
+    INITIAL_WEIGHT = 8
+    MIN_WEIGHT = 1
+    MAX_WEIGHT = 256
+
+    def __init__(self, question_pool, adaptive=True, no_repeat_window=0,
+                 seed=None):
+        self.items = question_items(question_pool)
+        self.indices = {
+            question: index for index, (question, _) in enumerate(self.items)
+        }
+        self.adaptive = adaptive
+        self.sampler = FenwickSampler(
+            [self.INITIAL_WEIGHT] * len(self.items), seed
+        )
+        # Questions recently yielded have weight 0 in the sampler, their
+        # true weights are kept here until they leave the window
+        self.no_repeat_window = min(no_repeat_window, len(self.items) - 1)
+        self.window = collections.deque()
+        self.held_weights = {}
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        while self.items:
+            with self.lock:
+                index = self.sampler.draw()
+                if self.no_repeat_window > 0:
+                    self.held_weights[index] = self.sampler.weights[index]
+                    self.sampler.update(index, 0)
+                    self.window.append(index)
+                    if len(self.window) > self.no_repeat_window:
+                        released = self.window.popleft()
+                        self.sampler.update(
+                            released, self.held_weights.pop(released)
+                        )
+            yield self.items[index]
+
+    def record_answer(self, question, correct_answer, chosen_answer):
+        """
+        Adjust the weight of question according to whether chosen_answer
+        was correct.
+        """
+        if not self.adaptive or question not in self.indices:
+            return
+        index = self.indices[question]
+        with self.lock:
+            held = index in self.held_weights
+            weight = self.held_weights[index] if held \
+                else self.sampler.weights[index]
+            if chosen_answer == correct_answer:
+                weight = max(self.MIN_WEIGHT, weight // 2)
+            else:
+                weight = min(self.MAX_WEIGHT, weight * 2)
+            if held:
+                self.held_weights[index] = weight
+            else:
+                self.sampler.update(index, weight)
+
+
+def prepare_question(question_iter, answer_provider):
+    """
+    Return the next (question, correct_answer, answers) tuple from
+    question_iter and answer_provider, or None if there are no more
+    questions.
+    """
+    try:
+        question, correct_answer = next(question_iter)
+    except StopIteration:
+        return None
+    try:
+        answers = answer_provider.get_answers(question)
+    except ValueError:
+        answers = ["???"]
+    return question, correct_answer, answers
@@ -0,0 +1,282 @@
+"""
+A line based TCP server asking questions to many clients at once, which can
+be used with telnet or netcat. Every session shares the same read-only
+answer provider and question items; each has its own question stream and
+score. Sessions are coroutines on a single asyncio event loop, so the cost
+of a session is a socket and a few small objects.
+"""
+
+import asyncio
+import itertools
+import re
+import time
+
+from curses_questions.question_providers import (
+    IndexSampler, prepare_question, question_items,
+    weighted_question_generator
+)
+
+# Telnet option negotiation (IAC followed by a command and, for WILL,
+# WONT, DO and DONT, an option) which telnet clients may send
+TELNET_COMMAND = re.compile(rb"\xff[\xfb-\xfe].|\xff[\xf0-\xfa]", re.S)
+PROMPT = b"> "
+NEWLINE = "\r\n"
+# Connections waiting to be accepted, asyncio's default of 100 makes a class
+# connecting at once wait for SYN retransmissions
+BACKLOG = 1024
+
+
+def question_stream(items, no_questions=None, seed=None):
+    """
+    Generator which yields no_questions (question, answer) tuples from the
+    sequence items without replacement, or endlessly with replacement if
+    no_questions is None. items is not copied, so any number of streams
+    may share it.
+    """
+    if not items:
+        return
+    sampler = IndexSampler(len(items), seed)
+    if no_questions is None:
+        indices = sampler.with_replacement()
+    else:
+        indices = itertools.islice(sampler.without_replacement(), no_questions)
+    for index in indices:
+        yield items[index]
+
+
+def format_question(question_no, question, answers, preceding_str=""):
+    lines = ["", "Question {n}: {preceding}{question}".format(
+        n=question_no, preceding=preceding_str, question=question.rstrip()
+    )]
+    lines.extend(
+        "  {n}. {answer}".format(n=n, answer=answer.rstrip())
+        for n, answer in enumerate(answers, 1)
+    )
+    return NEWLINE.join(lines) + NEWLINE
+
+
+class QuizSession:
+    """
+    The state of one client: its question stream and score.
+    """
+
+    __slots__ = ("question_iter", "correct", "answered")
+
+    def __init__(self, question_iter):
+        self.question_iter = question_iter
+        self.correct = 0
+        self.answered = 0
+
+    def score(self):
+        return "{correct}/{answered}".format(
+            correct=self.correct, answered=self.answered
+        )
+
+
+class QuizServer:
+    """
+    Asks questions from answer_provider to every client connecting over
+    TCP. make_questions is called with the number of each session (counting
+    from 0) and returns an iterable of (question, correct_answer) tuples for
+    it. Clients answer with the number of their choice followed by a
+    newline, or q to quit. Sessions idle for idle_timeout seconds are
+    closed, and clients connecting while max_sessions sessions are running
+    are turned away.
+    """
+
+    def __init__(self, answer_provider, make_questions, preceding_str="",
+                 idle_timeout=600, max_sessions=None, answer_callback=None):
+        self.answer_provider = answer_provider
+        self.make_questions = make_questions
+        self.preceding_str = preceding_str
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.answer_callback = answer_callback
+        self.sessions = set()
+        self.session_count = itertools.count()
+        self.server = None
+
+    @classmethod
+    def from_answer_provider(cls, answer_provider, no_questions=None,
+                             seed=None, weights=None, **kwargs):
+        """
+        Create a server asking no_questions random questions per session
+        (endlessly if None) from every question of answer_provider. The
+        question items are built once and shared by every session. With a
+        seed, session n asks the same questions in every run. If
+        answer_provider has several decks weights are their relative
+        weights, see weighted_question_generator().
+        """
+        deck_items = getattr(answer_provider, "deck_items", None)
+        if deck_items is not None and len(deck_items) > 1:
+            weights = weights or [1] * len(deck_items)
+
+            def make_questions(session_no):
+                return weighted_question_generator(
+                    deck_items,
+                    weights,
+                    no_questions,
+                    no_questions is None,
+                    None if seed is None else "{seed}:{n}".format(
+                        seed=seed, n=session_no
+                    ),
+                )
+        else:
+            items = question_items(answer_provider.get_all_questions())
+
+            def make_questions(session_no):
+                return question_stream(
+                    items,
+                    no_questions,
+                    None if seed is None else "{seed}:{n}".format(
+                        seed=seed, n=session_no
+                    ),
+                )
+        return cls(answer_provider, make_questions, **kwargs)
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Start listening on host and port (0 for any free port), returning
+        the asyncio server.
+        """
+        self.server = await asyncio.start_server(
+            self.handle_client, host, port, backlog=BACKLOG
+        )
+        return self.server
+
+    def address(self):
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self, host="127.0.0.1", port=0):
+        if self.server is None:
+            await self.start(host, port)
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def read_line(self, reader):
+        """
+        Return the next line from the client without telnet commands or
+        surrounding whitespace, or None if the client has disconnected or
+        been idle for too long.
+        """
+        try:
+            line = await asyncio.wait_for(
+                reader.readline(), self.idle_timeout
+            )
+        except (asyncio.TimeoutError, ValueError, ConnectionError):
+            # ValueError is raised for lines longer than the reader's limit
+            return None
+        if not line:
+            return None
+        return TELNET_COMMAND.sub(b"", line).decode(
+            "utf-8", "replace"
+        ).strip()
+
+    async def handle_client(self, reader, writer):
+        if self.max_sessions is not None and \
+           len(self.sessions) >= self.max_sessions:
+            writer.write(
+                ("Too many sessions, try again later" + NEWLINE).encode()
+            )
+            await self.close_writer(writer)
+            return
+        session = QuizSession(
+            iter(self.make_questions(next(self.session_count)))
+        )
+        self.sessions.add(session)
+        try:
+            await self.run_session(session, reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions.discard(session)
+            await self.close_writer(writer)
+
+    async def run_session(self, session, reader, writer):
+        writer.write((
+            "Answer with the number of your choice, or q to quit." + NEWLINE
+        ).encode())
+        question_no = 0
+        while True:
+            prepared = prepare_question(
+                session.question_iter, self.answer_provider
+            )
+            if prepared is None:
+                break
+            question_no += 1
+            question, correct_answer, answers = prepared
+            writer.write(format_question(
+                question_no, question, answers, self.preceding_str
+            ).encode() + PROMPT)
+            await writer.drain()
+            while True:
+                line = await self.read_line(reader)
+                if line is None:
+                    return
+                if line == "q" or (
+                        line.isdigit() and 1 <= int(line) <= len(answers)):
+                    break
+                writer.write(("Choose 1 to {n}, or q to quit".format(
+                    n=len(answers)
+                ) + NEWLINE).encode() + PROMPT)
+                await writer.drain()
+            if line == "q":
+                break
+            chosen_answer = answers[int(line) - 1]
+            session.answered += 1
+            if chosen_answer == correct_answer:
+                session.correct += 1
+                verdict = "Correct!"
+            else:
+                verdict = "Wrong, the answer was {n}. {answer}".format(
+                    n=answers.index(correct_answer) + 1,
+                    answer=correct_answer.rstrip(),
+                )
+            writer.write("{verdict} ({score}){newline}".format(
+                verdict=verdict, score=session.score(), newline=NEWLINE
+            ).encode())
+            if self.answer_callback is not None:
+                self.answer_callback(question, correct_answer, chosen_answer)
+        writer.write(("Finished, you scored {score}".format(
+            score=session.score()
+        ) + NEWLINE).encode())
+        await writer.drain()
+
+    async def close_writer(self, writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+CHOICE = re.compile(rb"^  (\d+)\. ", re.M)
+
+
+async def loopback_client(host, port, choose=None):
+    """
+    Connect to a QuizServer and answer its questions until they run out,
+    choose being called with the number of choices to get the number to
+    answer (the first choice if not given). Returns a list of the seconds
+    taken for each answer to be acknowledged with the next question.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies = []
+    try:
+        try:
+            text = await reader.readuntil(PROMPT)
+        except asyncio.IncompleteReadError:
+            return latencies
+        while True:
+            no_choices = len(CHOICE.findall(text))
+            choice = choose(no_choices) if choose is not None else 1
+            start = time.perf_counter()
+            writer.write("{choice}\r\n".format(choice=choice).encode())
+            try:
+                text = await reader.readuntil(PROMPT)
+            except asyncio.IncompleteReadError:
+                return latencies
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+        await writer.wait_closed()
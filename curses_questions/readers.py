@@ -0,0 +1,157 @@
+"""
+Functions for reading the lines of input files, which are decompressed if
+they are gzip, xz or bzip2 compressed (as recognised by their first bytes)
+and otherwise memory mapped.
+"""
+
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import mmap
+import os
+import random
+
+# Leading bytes of compressed files, and functions opening them for reading
+# as binary files given a path or file object
+COMPRESSIONS = (
+    (b"\x1f\x8b", gzip.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+    (b"BZh", bz2.open),
+)
+MAGIC_LENGTH = max(len(magic) for magic, _ in COMPRESSIONS)
+# Number of bytes of a memory mapped file decoded at a time
+BLOCK_SIZE = 1 << 20
+
+
+def decompressor(magic):
+    """
+    Return the function opening files beginning with the bytes magic, or
+    None if magic is not the start of a compressed file.
+    """
+    for prefix, opener in COMPRESSIONS:
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+
+def is_compressed(path):
+    with open(path, "rb") as f:
+        return decompressor(f.read(MAGIC_LENGTH)) is not None
+
+
+def decode_lines(data, encoding="utf-8"):
+    """
+    Return an iterable of the lines of the bytes data, with newlines
+    translated as when reading a file in text mode.
+    """
+    # newline=None gives the same newline translation as reading the file in
+    # text mode
+    return io.StringIO(data.decode(encoding), newline=None)
+
+
+def line_blocks(mapped, start=0, end=None, block_size=BLOCK_SIZE):
+    """
+    Yield (start, end) tuples of byte offsets dividing mapped[start:end]
+    (bytes or a memory mapped file, start being the start of a line) into
+    blocks of whole lines of roughly block_size bytes.
+    """
+    end = len(mapped) if end is None else end
+    while start < end:
+        block_end = mapped.find(b"\n", min(start + block_size, end) - 1, end)
+        block_end = end if block_end < 0 else block_end + 1
+        yield start, block_end
+        start = block_end
+
+
+def mapped_lines(mapped, encoding="utf-8", block_size=BLOCK_SIZE):
+    """
+    Yield the lines of the memory mapped file mapped, decoding roughly
+    block_size bytes at a time. Newlines are translated as when reading a
+    file in text mode.
+    """
+    for start, end in line_blocks(mapped, block_size=block_size):
+        yield from decode_lines(mapped[start:end], encoding)
+
+
+@contextlib.contextmanager
+def open_lines(path, encoding="utf-8"):
+    """
+    Context manager yielding an iterable of the lines of the file at path,
+    decompressing it as it is read if it is compressed and memory mapping
+    it otherwise.
+    """
+    with open(path, "rb") as f:
+        opener = decompressor(f.read(MAGIC_LENGTH))
+        if opener is not None:
+            f.seek(0)
+            with opener(f) as raw:
+                yield io.TextIOWrapper(raw, encoding)
+        elif os.fstat(f.fileno()).st_size == 0:
+            # Empty files can't be memory mapped
+            yield iter(())
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped_lines(mapped, encoding)
+
+
+def lines_at(path, offsets, encoding="utf-8"):
+    """
+    Return a list of the lines of the uncompressed file at path which start
+    at the byte offsets offsets, with newlines translated as when reading a
+    file in text mode.
+    """
+    lines = []
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            lines.extend(decode_lines(f.readline(), encoding))
+    return lines
+
+
+def random_lines(path, k, encoding="utf-8"):
+    """
+    Return a list of k lines chosen at random (possibly repeating) from the
+    uncompressed file at path, by seeking to random positions in it. Lines
+    following longer lines are more likely to be chosen.
+    """
+    size = os.path.getsize(path)
+    lines = []
+    if size == 0:
+        return lines
+    with open(path, "rb") as f:
+        for _ in range(k):
+            f.seek(random.randrange(size))
+            # Skip the rest of the line we landed in
+            f.readline()
+            if f.tell() >= size:
+                f.seek(0)
+            lines.extend(decode_lines(f.readline(), encoding))
+    return lines
+
+
+@contextlib.contextmanager
+def open_stream_lines(stream):
+    """
+    Context manager yielding an iterable of the lines of the text stream
+    stream (for example stdin), decompressing it as it is read if it is
+    compressed.
+    """
+    buffer = stream.buffer
+    opener = decompressor(buffer.peek(MAGIC_LENGTH)[:MAGIC_LENGTH])
+    if opener is None:
+        yield stream
+    else:
+        with opener(buffer) as raw:
+            yield io.TextIOWrapper(raw, stream.encoding)
+
+
+def infile_lines(infile):
+    """
+    Return a context manager yielding an iterable of the lines of the text
+    file infile, see open_lines() and open_stream_lines().
+    """
+    if os.path.isfile(infile.name):
+        return open_lines(infile.name, infile.encoding)
+    return open_stream_lines(infile)
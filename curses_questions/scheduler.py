@@ -0,0 +1,204 @@
+"""
+Spaced repetition scheduling of questions, using a variant of the SM-2
+algorithm with reviews persisted to a SQLite database.
+"""
+
+import collections
+import hashlib
+import heapq
+import os
+import sqlite3
+import threading
+import time
+
+from curses_questions.question_providers import question_items
+
+DAY = 24 * 60 * 60
+# Seconds until a question answered incorrectly is due again
+RELEARN_DELAY = 60
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+
+def default_store_path():
+    """
+    Return the path of the default review database.
+    """
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return os.path.join(base, "curses-questions", "reviews.sqlite")
+
+
+def card_id(deck_id, question):
+    """
+    Return the key used to store reviews of question from the deck deck_id.
+    """
+    return hashlib.sha1(
+        (deck_id + "\0" + question).encode("utf-8")
+    ).hexdigest()
+
+
+class Review:
+    """
+    The scheduling state of a card.
+    """
+
+    __slots__ = ("card", "ease", "interval", "repetitions", "due")
+
+    def __init__(self, card, ease=INITIAL_EASE, interval=0.0, repetitions=0,
+                 due=0.0):
+        self.card = card
+        self.ease = ease
+        self.interval = interval
+        self.repetitions = repetitions
+        self.due = due
+
+    def update(self, correct, now):
+        """
+        Update the review after the card was answered at time now. Correct
+        answers are graded 4 and incorrect answers 1 on SM-2's 0-5 scale.
+        """
+        quality = 4 if correct else 1
+        self.ease = max(
+            MIN_EASE,
+            self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        )
+        if correct:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = DAY
+            elif self.repetitions == 2:
+                self.interval = 6 * DAY
+            else:
+                self.interval *= self.ease
+            self.due = now + self.interval
+        else:
+            self.repetitions = 0
+            self.interval = 0.0
+            self.due = now + RELEARN_DELAY
+
+
+class ReviewStore:
+    """
+    Reviews of cards stored in a SQLite database. Writes are buffered and
+    committed batch_size at a time in a single transaction.
+    """
+
+    def __init__(self, path, batch_size=50):
+        if path != ":memory:":
+            os.makedirs(
+                os.path.dirname(os.path.abspath(path)), exist_ok=True
+            )
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS reviews (
+                   card TEXT PRIMARY KEY,
+                   deck TEXT NOT NULL,
+                   ease REAL NOT NULL,
+                   interval REAL NOT NULL,
+                   repetitions INTEGER NOT NULL,
+                   due REAL NOT NULL
+               )"""
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS reviews_deck_due "
+            "ON reviews (deck, due)"
+        )
+        self.conn.commit()
+        self.batch_size = batch_size
+        self.pending = []
+
+    def load(self, deck_id):
+        """
+        Return a dict of card ids to Reviews for the deck deck_id.
+        """
+        return {
+            card: Review(card, ease, interval, repetitions, due)
+            for card, ease, interval, repetitions, due in self.conn.execute(
+                "SELECT card, ease, interval, repetitions, due "
+                "FROM reviews WHERE deck = ?",
+                (deck_id,)
+            )
+        }
+
+    def save(self, deck_id, review):
+        self.pending.append((
+            review.card, deck_id, review.ease, review.interval,
+            review.repetitions, review.due
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO reviews "
+                "(card, deck, ease, interval, repetitions, due) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self.pending
+            )
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+class Scheduler:
+    """
+    Yields questions from a pool in order of when they are next due. Due
+    questions which have been answered before come first, then new
+    questions in the order they appear in the pool, and once both run out
+    the questions due soonest. Reviewed questions are kept in a heap so
+    the next question costs O(log n), and answers reported through
+    record_answer() reschedule their question.
+    """
+
+    def __init__(self, question_pool, store, deck_id, clock=time.time):
+        self.items = question_items(question_pool)
+        self.store = store
+        self.deck_id = deck_id
+        self.clock = clock
+        self.lock = threading.Lock()
+        reviews = store.load(deck_id)
+        # Questions to their index in self.items and their Review
+        self.reviews = {}
+        self.heap = []
+        self.new = collections.deque()
+        for index, (question, _) in enumerate(self.items):
+            card = card_id(deck_id, question)
+            if card in reviews:
+                review = reviews[card]
+                self.heap.append((review.due, index))
+            else:
+                review = Review(card)
+                self.new.append(index)
+            self.reviews[question] = index, review
+        heapq.heapify(self.heap)
+
+    def __iter__(self):
+        while True:
+            with self.lock:
+                if self.heap and (
+                        self.heap[0][0] <= self.clock() or not self.new):
+                    _, index = heapq.heappop(self.heap)
+                elif self.new:
+                    index = self.new.popleft()
+                else:
+                    return
+            yield self.items[index]
+
+    def record_answer(self, question, correct_answer, chosen_answer):
+        """
+        Reschedule question according to whether chosen_answer was correct.
+        """
+        if question not in self.reviews:
+            return
+        index, review = self.reviews[question]
+        with self.lock:
+            review.update(chosen_answer == correct_answer, self.clock())
+            heapq.heappush(self.heap, (review.due, index))
+        self.store.save(self.deck_id, review)
@@ -0,0 +1,19 @@
+"""
+Argument types shared by the command line scripts.
+"""
+
+import argparse
+
+
+def check_positive(value):
+    try:
+        int_value = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "Invalid int value: '{value}'".format(value=value)
+        )
+    if int_value <= 0:
+        raise argparse.ArgumentTypeError(
+            "Expected positive integer but got: '{value}'".format(value=value)
+        )
+    return int_value
@@ -6,104 +6,395 @@ Uses curses to display questions when run as a script.
 
 import argparse
 import curses
+import itertools
 import os
+import random
 import sys
 from collections import OrderedDict
 
-from curses_questions.widgets import (
-    QuestionWidget, AnswerWidget, RunningTotalWidget
-)
+from curses_questions.question_loop import questions_loop
 from curses_questions.answer_providers import (
-    RandomizedAnswerProvider, PresetAnswerProvider
+    RandomizedAnswerProvider, PresetAnswerProvider, SimilarAnswerProvider
 )
 from curses_questions.question_providers import (
-    randomized_question_generator, inf_question_generator
+    randomized_question_generator, inf_question_generator,
+    weighted_question_generator, AdaptiveQuestionGenerator
+)
+from curses_questions.deck_cache import (
+    cache_path, remove_stale_decks, write_deck, is_compiled_deck,
+    CompiledDeck
+)
+from curses_questions.parsing import parse_file
+from curses_questions.readers import (
+    infile_lines, is_compressed, lines_at, random_lines
+)
+from curses_questions.search_index import SearchIndex
+from curses_questions.anki import is_apkg, open_apkg_pairs
+from curses_questions.scheduler import (
+    default_store_path, ReviewStore, Scheduler
+)
+from curses_questions.profiling import PROFILE_ENV, Profiler
+from curses_questions.deck_server import default_socket_path, DeckClient
+from curses_questions.decks import (
+    FORMATS, deck_option, read_decks, MultiDeckAnswerProvider
 )
+from curses_questions.deck_watch import WatchedDeck
+from curses_questions.session_log import (
+    DECK_SEPARATOR, default_log_path, SessionLog
+)
+from curses_questions.scripts.arguments import check_positive
 
 
-def check_positive(value):
-    try:
-        int_value = int(value)
-    except ValueError:
+# Number of lines sampled from the whole deck with --filter, to use as
+# incorrect answers
+FILTER_SAMPLE_SIZE = 100
+
+
+def parse_weight(value):
+    """
+    Parse a --weight value of the form PATTERN=WEIGHT.
+    """
+    pattern, _, weight = value.rpartition("=")
+    if not pattern:
         raise argparse.ArgumentTypeError(
-            "Invalid int value: '{value}'".format(value=value)
+            "Expected PATTERN=WEIGHT but got: '{value}'".format(value=value)
         )
-    if int_value <= 0:
+    return pattern, check_positive(weight)
+
+
+def parse_deck_format(value):
+    """
+    Parse a --deck-format value of the form PATTERN=FORMAT[:VALUE].
+    """
+    pattern, _, deck_format = value.partition("=")
+    kind, _, format_value = deck_format.partition(":")
+    if not pattern or kind not in FORMATS or \
+       (kind == "regex" and not format_value):
         raise argparse.ArgumentTypeError(
-            "Expected positive integer but got: '{value}'".format(value=value)
-        )
-    return int_value
-
-
-def questions_loop(stdscr, question_gen, answer_provider, preceding_str):
-    # Sets bg colour to black, curses.wrapper resets this on termination
-    curses.init_color(0, 0, 0, 0)
-    # We must call this to be able to use -1 in the next command
-    curses.use_default_colors()
-    # Hide the cursor
-    curses.curs_set(0)
-    # -1 sets the text bg colour to the current bg colour of the terminal
-    curses.init_pair(1, curses.COLOR_CYAN, -1)
-    curses.init_pair(2, curses.COLOR_BLUE, -1)
-    curses.init_pair(3, curses.COLOR_GREEN, -1)
-    curses.init_pair(4, curses.COLOR_RED, -1)
-    curses.init_pair(5, curses.COLOR_YELLOW, -1)
-
-    question_widget = QuestionWidget("???", preceding_str, curses.color_pair(1), curses.color_pair(2), 0)
-    answer_widget = AnswerWidget([], 3, 4, curses.A_DIM, curses.A_BOLD)
-    running_total_widget = RunningTotalWidget()
-    for question_no, (question, correct_answer) in enumerate(question_gen, 1):
-        # Print out the question
-        stdscr.clear()
-        question_widget.next_question(question)
-
-        # Print out running total of questions answered correctly
-        running_total_widget.draw(stdscr)
-
-        # Print out the answers
-        try:
-            answers = answer_provider.get_answers(question)
-        except ValueError:
-            answers = ["???"]
-        answer_widget.clear_coloured_answers()
-        answer_widget.answers = answers
-
-        curses.ungetch(curses.KEY_RESIZE)
-        # Here we wait for user input and react accordingly
-        answer_chosen = False
-        while True:
-            c = stdscr.getch()
-            if chr(c) == "q":  # User has quit
-                return
-            elif c == curses.KEY_RESIZE:  # We redraw on resize
-                stdscr.clear()
-                question_widget.draw(stdscr)
-                answer_widget.draw(stdscr, question_no % 2)
-                running_total_widget.draw(stdscr)
-                stdscr.border(0)
-                stdscr.refresh()
-            elif answer_chosen:  # User has gone to next question
-                answer_chosen = False
-                break
-            elif chr(c).isdigit() and 1 <= int(chr(c)) <= len(answers):
-                answer_chosen = True
-                chosen_answer = answers[int(chr(c)) - 1]
-                answer_widget.add_green_answer(
-                    answers.index(correct_answer) + 1
-                )
-                if chosen_answer == correct_answer:
-                    running_total_widget.increment(True)
-                else:
-                    answer_widget.add_red_answer(int(chr(c)))
-                    running_total_widget.increment(False)
-                # Set next key to resize so our changes are drawn
-                curses.ungetch(curses.KEY_RESIZE)
+            "Expected PATTERN=delimiter[:DELIMITER], PATTERN=regex:REGEX or PATTERN=preset[:DELIMITER] but got: '{value}'".format(value=value)
+        )
+    return pattern, (kind, format_value or "\t")
 
 
-def main():
+def deck_id(args):
+    """
+    Return a string identifying the deck read from args.infiles.
+    """
+    if args.infile is sys.stdin:
+        return "<stdin>"
+    return DECK_SEPARATOR.join(os.path.abspath(f.name) for f in args.infiles)
+
+
+def file_input(args):
+    """
+    Return True if args.infile is a regular file, which can be opened again
+    by name. Reading from a pipe (or FIFO) by name would consume its input.
+    """
+    return args.infile is not sys.stdin and os.path.isfile(args.infile.name)
+
+
+def apkg_input(args):
+    """
+    Return True if args.infile is an Anki .apkg file.
+    """
+    return file_input(args) and is_apkg(args.infile.name)
+
+
+def compiled_input(args):
+    """
+    Return True if args.infile is a compiled deck.
+    """
+    return file_input(args) and is_compiled_deck(args.infile.name)
+
+
+def apkg_pairs(args):
+    """
+    Return a context manager yielding (question, answer) tuples from the
+    notes of the .apkg file args.infile.
+    """
+    question_field, answer_field = args.fields or (0, 0)
+    return open_apkg_pairs(
+        args.infile.name, question_field - 1, answer_field - 1
+    )
+
+
+def parse_answer_provider(args):
+    """
+    Create an answer provider from all the lines in args.infile.
+    """
+    if apkg_input(args):
+        with apkg_pairs(args) as pairs:
+            return RandomizedAnswerProvider(OrderedDict(pairs), args.choices)
+    if compiled_input(args):
+        return compiled_answer_provider(CompiledDeck(args.infile.name), args)
+    if args.jobs and args.jobs > 1 and args.infile is not sys.stdin \
+       and os.path.isfile(args.infile.name) \
+       and not is_compressed(args.infile.name):
+        parsed = parse_file(
+            args.infile.name,
+            args.delimiter,
+            args.regex,
+            args.preset_answers,
+            args.infile.encoding,
+            args.jobs,
+        )
+        if args.preset_answers:
+            return PresetAnswerProvider.from_records(parsed.items())
+        else:
+            return RandomizedAnswerProvider(parsed, args.choices)
+    with infile_lines(args.infile) as file_lines:
+        if args.preset_answers:
+            return PresetAnswerProvider.parse_from_iter(
+                file_lines,
+                args.delimiter
+            )
+        elif args.regex:
+            return RandomizedAnswerProvider.parse_from_iter_regex(
+                file_lines,
+                args.regex,
+                args.choices,
+            )
+        else:
+            return RandomizedAnswerProvider.parse_from_iter(
+                file_lines,
+                args.choices,
+                args.delimiter
+            )
+
+
+def cached_answer_provider(args):
+    """
+    Create an answer provider from the compiled deck cached for
+    args.infile, compiling and caching args.infile first if needed.
+    """
+    if args.infile is sys.stdin or not os.path.isfile(args.infile.name) \
+       or compiled_input(args):
+        return parse_answer_provider(args)
+    path = cache_path(
+        args.infile.name, args.delimiter, args.regex, args.preset_answers,
+        args.fields
+    )
+    if not os.path.exists(path):
+        answer_provider = parse_answer_provider(args)
+        if args.preset_answers:
+            records = answer_provider.question_to_answers_map.items()
+        else:
+            records = (
+                (question, [answer]) for question, answer
+                in answer_provider.question_pool.items()
+            )
+        write_deck(path, records, answer_index=not args.preset_answers)
+        remove_stale_decks(path)
+        return answer_provider
+    return compiled_answer_provider(CompiledDeck(path), args)
+
+
+def compiled_answer_provider(deck, args):
+    """
+    Create an answer provider backed by the compiled deck deck.
+    """
+    if args.preset_answers:
+        return PresetAnswerProvider(deck.question_to_answers_map())
+    else:
+        return RandomizedAnswerProvider(
+            deck.question_pool(), args.choices,
+            answer_index=deck.answer_index()
+        )
+
+
+def multi_deck_answer_provider(args):
+    """
+    Create an answer provider from all the decks in args.infiles, read in
+    parallel.
+    """
+    if args.preset_answers:
+        default_format = "preset", args.delimiter
+    elif args.regex:
+        default_format = "regex", args.regex
+    else:
+        default_format = "delimiter", args.delimiter
+    paths = [f.name for f in args.infiles]
+    decks = read_decks(
+        paths,
+        [deck_option(path, args.deck_format, default_format)
+         for path in paths],
+        args.fields,
+        args.infile.encoding,
+        args.jobs,
+    )
+    return MultiDeckAnswerProvider.from_decks(
+        decks, args.shared_answers, args.choices
+    )
+
+
+def filtered_answer_provider(args):
+    """
+    Create an answer provider from the lines of args.infile matching the
+    search args.filter, found using the deck's search index. Returns None
+    if no lines match.
+    """
+    index = SearchIndex(args.infile.name, args.infile.encoding)
+    try:
+        offsets = index.search(args.filter)
+    finally:
+        index.close()
+    if not offsets:
+        return None
+    file_lines = lines_at(args.infile.name, offsets, args.infile.encoding)
+    if args.preset_answers:
+        return PresetAnswerProvider.parse_from_iter(
+            file_lines,
+            args.delimiter
+        )
+    # Incorrect answers are also drawn from a sample of the whole deck, as
+    # the matching questions may have few distinct answers
+    sample = random_lines(
+        args.infile.name, FILTER_SAMPLE_SIZE, args.infile.encoding
+    )
+    if args.regex:
+        pairs = RandomizedAnswerProvider.iter_pairs_regex(
+            file_lines, args.regex
+        )
+        extra_pairs = RandomizedAnswerProvider.iter_pairs_regex(
+            sample, args.regex
+        )
+    else:
+        pairs = RandomizedAnswerProvider.iter_pairs(
+            file_lines, args.delimiter
+        )
+        extra_pairs = RandomizedAnswerProvider.iter_pairs(
+            sample, args.delimiter
+        )
+    return RandomizedAnswerProvider(
+        OrderedDict(pairs),
+        args.choices,
+        [answer for _, answer in extra_pairs],
+    )
+
+
+def watched_deck(args):
+    """
+    Create a WatchedDeck of args.infile, which applies changes to the file
+    as questions are asked.
+    """
+    if args.preset_answers:
+        def parse_pairs(lines):
+            return PresetAnswerProvider.iter_records(lines, args.delimiter)
+    elif args.regex:
+        def parse_pairs(lines):
+            return RandomizedAnswerProvider.iter_pairs_regex(lines, args.regex)
+    else:
+        def parse_pairs(lines):
+            return RandomizedAnswerProvider.iter_pairs(lines, args.delimiter)
+    return WatchedDeck(
+        args.infile.name,
+        parse_pairs,
+        args.preset_answers,
+        args.choices,
+        args.infile.encoding,
+        args.seed,
+    )
+
+
+def load_answer_provider(args):
+    """
+    Create the answer provider described by args, or None if args.filter
+    matches no questions.
+    """
+    if len(args.infiles) > 1:
+        return multi_deck_answer_provider(args)
+    if args.filter:
+        answer_provider = filtered_answer_provider(args)
+        if answer_provider is not None and args.similar:
+            answer_provider = SimilarAnswerProvider.from_provider(
+                answer_provider
+            )
+        return answer_provider
+    if args.stream:
+        answer_provider = stream_answer_provider(args)
+    elif args.cache:
+        answer_provider = cached_answer_provider(args)
+    else:
+        answer_provider = parse_answer_provider(args)
+    if args.similar:
+        answer_provider = SimilarAnswerProvider.from_provider(
+            answer_provider, args.cache
+        )
+    return answer_provider
+
+
+def server_options(args):
+    """
+    Return the options sent to a deck server to load args.infile.
+    """
+    return {
+        "path": os.path.abspath(args.infile.name),
+        "encoding": args.infile.encoding,
+        "delimiter": args.delimiter,
+        "regex": args.regex,
+        "preset_answers": args.preset_answers,
+        "choices": args.choices,
+        "fields": args.fields,
+        "jobs": args.jobs,
+        "cache": args.cache,
+        "similar": args.similar,
+    }
+
+
+def remote_answer_provider(args):
+    """
+    Create an answer provider for args.infile held by the deck server
+    listening on args.server.
+    """
+    client = DeckClient(args.server)
+    try:
+        return client.open_deck(server_options(args))
+    except ValueError as e:
+        client.close()
+        raise OSError(e)
+
+
+def stream_answer_provider(args):
+    """
+    Create an answer provider holding args.questions questions sampled
+    from args.infile, without reading all of args.infile into memory.
+    """
+    if apkg_input(args):
+        with apkg_pairs(args) as pairs:
+            return RandomizedAnswerProvider.sample_from_pairs(
+                pairs, args.questions, args.choices
+            )
+    with infile_lines(args.infile) as lines:
+        if args.preset_answers:
+            return PresetAnswerProvider.sample_from_iter(
+                lines,
+                args.questions,
+                args.delimiter
+            )
+        elif args.regex:
+            return RandomizedAnswerProvider.sample_from_iter_regex(
+                lines,
+                args.regex,
+                args.questions,
+                args.choices,
+            )
+        else:
+            return RandomizedAnswerProvider.sample_from_iter(
+                lines,
+                args.questions,
+                args.choices,
+                args.delimiter
+            )
+
+
+def create_parser():
+    """
+    Return the argument parser for curses-questions.
+    """
     description = """Answer questions from a text file using the number
                      keys. Questions and their answers should be on the
-                     same line and split by a common delimeter. The
+                     same line and split by a common delimeter, Anki
+                     .apkg files may also be read directly. The
                      answer choices displayed by the program for a given
                      question are sampled randomly from other questions
                      in the input file (in addition to the correct
@@ -116,13 +407,14 @@ def main():
     answer_format_group = parser.add_mutually_exclusive_group()
 
     # positional argument: infile
-    # description: name of file to read questions from
+    # description: names of files to read questions from
     parser.add_argument(
-        "infile",
-        nargs="?",
+        "infiles",
+        nargs="*",
         type=argparse.FileType("r"),
-        help="name of file to read questions from, defaults to stdin",
-        default=sys.stdin,
+        metavar="infile",
+        help="names of files to read questions from, defaults to stdin. Questions from several files are mixed together",
+        default=[sys.stdin],
     )
     # optional argument: delimiter
     # description: describes delimiter in input lines which divides question
@@ -191,62 +483,320 @@ def main():
         "--regex",
         help="Use only lines matching the given regex, taking question/answer as the first/second capture group respectively",
     )
+    # Optional argument: stream
+    # description: read the input lazily, holding only sampled questions
+    parser.add_argument(
+        "-s",
+        "--stream",
+        help="Read the input file lazily, keeping only the questions to be asked (and a sample of answers to use as incorrect answers) in memory. Useful for very large input files, incompatible with --all and --endless.",
+        action="store_true",
+    )
+    # Optional argument: cache
+    # description: cache the parsed input file in a compiled format
+    parser.add_argument(
+        "-C",
+        "--cache",
+        help="Cache the parsed input file in a compiled format, subsequent runs with the same input file and parsing options will load the compiled file instead of parsing the input file again. Has no effect when reading from stdin.",
+        action="store_true",
+    )
+    # Optional argument: fields
+    # description: note fields to use for .apkg input files
+    parser.add_argument(
+        "-f",
+        "--fields",
+        nargs=2,
+        type=check_positive,
+        help="if infile is an Anki .apkg file, the fields of each note to take as the question and answer. Without this option fields are guessed by looking at their content",
+    )
+    # Optional argument: jobs
+    # description: number of processes to parse the input file with
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=check_positive,
+        help="number of processes to use when parsing large input files or several input files, default is 1 for one input file and the number of CPUs for several",
+    )
+    # Optional argument: seed
+    # description: seed for the random number generators
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed for choosing questions and answers, runs with the same input file, options and seed will ask the same questions with the same answers",
+    )
+    # Optional argument: schedule
+    # description: choose questions by spaced repetition
+    parser.add_argument(
+        "-S",
+        "--schedule",
+        nargs="?",
+        const=default_store_path(),
+        metavar="DB",
+        help="Choose questions using spaced repetition, asking questions which are due for review and then new questions. Reviews are saved to the SQLite database DB, defaults to {path}".format(path=default_store_path()),
+    )
+    # Optional argument: adaptive
+    # description: ask questions answered incorrectly more often
+    parser.add_argument(
+        "--adaptive",
+        help="With --endless, ask questions more often the more they have been answered incorrectly (and less often when answered correctly)",
+        action="store_true",
+    )
+    # Optional argument: no-repeat
+    # description: window in which questions are not repeated
+    parser.add_argument(
+        "--no-repeat",
+        type=check_positive,
+        metavar="N",
+        help="With --endless, do not ask a question again until at least N other questions have been asked",
+        default=0,
+    )
+    # Optional argument: similar
+    # description: offer incorrect answers similar to the correct answer
+    parser.add_argument(
+        "--similar",
+        help="Offer incorrect answers which look similar to the correct answer (for example other years when the answer is a year) rather than random ones. Faster and more accurate with NumPy installed, with --cache the similarity index is cached too",
+        action="store_true",
+    )
+    # Optional argument: weight
+    # description: relative weight of questions from some input files
+    parser.add_argument(
+        "-w",
+        "--weight",
+        action="append",
+        type=parse_weight,
+        default=[],
+        metavar="PATTERN=WEIGHT",
+        help="With several input files, ask questions from input files whose name (with or without its extension) matches the glob PATTERN WEIGHT times as often as other questions, the default weight being 1. May be given more than once",
+    )
+    # Optional argument: deck-format
+    # description: format of some input files
+    parser.add_argument(
+        "-F",
+        "--deck-format",
+        action="append",
+        type=parse_deck_format,
+        default=[],
+        metavar="PATTERN=FORMAT",
+        help="With several input files, the format of input files whose name matches the glob PATTERN, overriding -d, -r and -pa. FORMAT is one of delimiter[:DELIMITER], regex:REGEX or preset[:DELIMITER], the delimiter defaulting to tab. May be given more than once",
+    )
+    # Optional argument: shared-answers
+    # description: draw incorrect answers from all input files
+    parser.add_argument(
+        "--shared-answers",
+        help="With several input files, draw incorrect answers from the answers of all input files rather than only the question's own file",
+        action="store_true",
+    )
+    # Optional argument: filter
+    # description: only ask questions matching a search
+    parser.add_argument(
+        "--filter",
+        metavar="QUERY",
+        help="Only ask questions from lines of the input file containing every word in QUERY, a word ending in * matches words beginning with it. Uses an index of the input file saved next to it, which is built the first time and again whenever the input file is modified",
+    )
+    # Optional argument: watch
+    # description: apply changes to the input file during the session
+    parser.add_argument(
+        "--watch",
+        help="With -e/--endless, pick up changes to the input file while questions are being asked, without restarting. Only the changed parts of the input file are parsed again",
+        action="store_true",
+    )
+    # Optional argument: log
+    # description: file to log answers to
+    parser.add_argument(
+        "-L",
+        "--log",
+        nargs="?",
+        const=default_log_path(),
+        metavar="FILE",
+        help="Append each answer, whether it was correct and how long it took to the CSV file FILE, defaults to {path}. Statistics for each question can then be seen with curses-questions-stats".format(path=default_log_path()),
+    )
+    # Optional argument: server
+    # description: socket of a deck server to load the input file from
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const=default_socket_path(),
+        metavar="SOCKET",
+        help="Ask questions from the input file held in memory by the deck server (started with curses-questions-server) listening on SOCKET, defaults to {path}. The server parses the input file the first time it is used and again whenever it is modified".format(path=default_socket_path()),
+    )
+    # Optional argument: profile
+    # description: file to write timings of the program to
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="curses-questions-profile.txt",
+        metavar="FILE",
+        help="Time parsing, answer and question generation, drawing and refreshing the screen, writing a summary of the timings to FILE on exit, defaults to curses-questions-profile.txt. The {env} environment variable may be set to FILE instead".format(env=PROFILE_ENV),
+        default=os.environ.get(PROFILE_ENV),
+    )
+    return parser
+
+
+def default_args(infiles, **options):
+    """
+    Return arguments as parsed from the command line for the open input
+    files infiles, with the given options and every other option left at
+    its default. Used to load decks for other programs.
+    """
+    args = create_parser().parse_args([])
+    for name, value in options.items():
+        setattr(args, name, value)
+    args.infiles = infiles
+    args.infile = infiles[0]
+    return args
+
+
+def main():
+    parser = create_parser()
     args = parser.parse_args()
+    args.infile = args.infiles[0]
+    if len(args.infiles) > 1 and (
+            args.stream or args.cache or args.server or args.similar):
+        parser.error("arguments -s/--stream, -C/--cache, --server and --similar: not allowed with several input files")
+    if (args.adaptive or args.no_repeat) and not args.endless:
+        parser.error("arguments --adaptive and --no-repeat: require -e/--endless")
+    if (args.adaptive or args.no_repeat) and args.schedule:
+        parser.error("arguments --adaptive and --no-repeat: not allowed with -S/--schedule")
+    if args.schedule and (args.all or args.stream):
+        parser.error("argument -S/--schedule: not allowed with -a/--all or -s/--stream")
+    if args.stream and (args.all or args.endless):
+        parser.error("argument -s/--stream: not allowed with -a/--all or -e/--endless")
+    if args.stream and args.cache:
+        parser.error("argument -C/--cache: not allowed with argument -s/--stream")
+    if apkg_input(args) and (args.preset_answers or args.regex):
+        parser.error("arguments -pa/--preset-answers and -r/--regex: not allowed with an .apkg infile")
+    if args.similar and args.preset_answers:
+        parser.error("argument --similar: not allowed with argument -pa/--preset-answers")
+    if args.filter and (
+            not file_input(args) or len(args.infiles) > 1
+            or args.stream or args.cache or args.server
+            or apkg_input(args) or compiled_input(args)
+            or is_compressed(args.infile.name)):
+        parser.error("argument --filter: only allowed with one uncompressed text input file, and not with -s/--stream, -C/--cache or --server")
+    if args.server and (args.infile is sys.stdin or args.stream):
+        parser.error("argument --server: not allowed with stdin or argument -s/--stream")
+    if args.watch and not args.endless:
+        parser.error("argument --watch: requires -e/--endless")
+    if args.watch and (
+            not file_input(args) or len(args.infiles) > 1
+            or args.cache or args.server or args.filter or args.similar
+            or args.schedule or args.adaptive or args.no_repeat
+            or apkg_input(args) or compiled_input(args)
+            or is_compressed(args.infile.name)):
+        parser.error("argument --watch: only allowed with one uncompressed text input file, and not with -C/--cache, --server, --filter, --similar, -S/--schedule, --adaptive or --no-repeat")
+    if compiled_input(args) and args.stream:
+        parser.error("argument -s/--stream: not allowed with a compiled deck infile")
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    profiler = Profiler(enabled=bool(args.profile))
+    try:
+        run(args, profiler)
+    finally:
+        profiler.restore()
+        if args.profile:
+            profiler.write(args.profile)
 
-    file_lines = args.infile.readlines()
-    delim = args.delimiter
-    regex = args.regex
+
+def run(args, profiler):
+    """
+    Ask questions according to the parsed command line arguments args.
+    """
+    profiler.instrument_hot_paths()
 
     ##########################################
     # Create the correct answer provider obj #
     ##########################################
-    if args.preset_answers:
-        answer_provider = PresetAnswerProvider.parse_from_iter(
-            file_lines,
-            delim
-        )
-    elif regex:
-        answer_provider = RandomizedAnswerProvider.parse_from_iter_regex(
-            file_lines,
-            regex,
-            args.choices,
-        )
-    else:
-        answer_provider = RandomizedAnswerProvider.parse_from_iter(
-            file_lines,
-            args.choices,
-            delim
-        )
+    deck = None
+    with profiler.timer("load"):
+        if args.watch:
+            deck = watched_deck(args)
+            answer_provider = deck.answer_provider
+        elif args.server:
+            try:
+                answer_provider = remote_answer_provider(args)
+            except OSError as e:
+                print("Unable to use the deck server: {e}".format(e=e))
+                return
+        else:
+            answer_provider = load_answer_provider(args)
+    if answer_provider is None:
+        print("No questions match the filter '{query}'".format(
+            query=args.filter
+        ))
+        return
 
     ############################################
     # Create the correct question provider obj #
     ############################################
-    # Assert there are actually questions in the input file
+    # Assert there are actually questions in the input file, a watched one
+    # may have questions added to it later
     question_to_answer_mapping = answer_provider.get_all_questions()
-    if not question_to_answer_mapping:
+    if not question_to_answer_mapping and deck is None:
         print("Input file is empty or has no lines in the correct format!")
         return
     # Create the correct question generator object according to cmdline args
-    if args.endless:
-        question_gen = inf_question_generator(question_to_answer_mapping)
+    answer_callback = None
+    review_store = None
+    if deck is not None:
+        question_gen = deck.questions()
+    elif args.schedule:
+        review_store = ReviewStore(args.schedule)
+        scheduler = Scheduler(
+            question_to_answer_mapping, review_store, deck_id(args)
+        )
+        answer_callback = scheduler.record_answer
+        if args.endless:
+            question_gen = scheduler
+        else:
+            question_gen = itertools.islice(scheduler, args.questions)
+    elif args.endless and (args.adaptive or args.no_repeat):
+        question_gen = AdaptiveQuestionGenerator(
+            question_to_answer_mapping,
+            args.adaptive,
+            args.no_repeat,
+            args.seed,
+        )
+        answer_callback = question_gen.record_answer
     elif args.all:
         question_gen = question_to_answer_mapping.items()
+    elif len(args.infiles) > 1:
+        question_gen = weighted_question_generator(
+            answer_provider.deck_items,
+            [deck_option(f.name, args.weight, 1) for f in args.infiles],
+            None if args.endless else args.questions,
+            args.endless,
+            args.seed,
+        )
+    elif args.endless:
+        question_gen = inf_question_generator(
+            question_to_answer_mapping, seed=args.seed
+        )
     else:
         question_gen = randomized_question_generator(
-            question_to_answer_mapping, args.questions
+            question_to_answer_mapping, args.questions, seed=args.seed
         )
 
+    question_gen = profiler.wrap_iter("generator.next", question_gen)
+
     # To read from standard input and still be able to handle user key
     # presses we need to do the following, see:
     # https://stackoverflow.com/questions/53696818/how-to-i-make-python-curses-application-pipeline-friendly
     f = open("/dev/tty")
     os.dup2(f.fileno(), 0)
+    session_log = SessionLog(args.log, deck_id(args)) if args.log else None
     # wrapper() calls cbreak() and noecho() so we don't have to
-    curses.wrapper(
-        lambda stdscr: questions_loop(
-            stdscr, question_gen, answer_provider, args.precede
+    try:
+        curses.wrapper(
+            lambda stdscr: questions_loop(
+                stdscr, question_gen, answer_provider, args.precede,
+                answer_callback, answer_log=session_log
+            )
         )
-    )
+    finally:
+        if review_store is not None:
+            review_store.close()
+        if session_log is not None:
+            session_log.close()
 
 
 if __name__ == "__main__":
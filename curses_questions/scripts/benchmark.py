@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks parsing, answer generation, question generation, rendering and
+the quiz server, saving results as JSON baselines which later runs can be
+compared against.
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from curses_questions.answer_providers import (
+    RandomizedAnswerProvider, PresetAnswerProvider
+)
+from curses_questions.question_providers import (
+    randomized_question_generator, inf_question_generator,
+    AdaptiveQuestionGenerator
+)
+from curses_questions.headless import run_headless
+from curses_questions.quiz_server import QuizServer, loopback_client
+from curses_questions.session_log import SessionLog, StatsStore
+
+
+def timed(function, repeat=3):
+    """
+    Return the fastest of repeat runs of function, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def deck_lines(no_lines, no_answers=3):
+    """
+    Return no_lines synthetic deck lines, each a question followed by
+    no_answers tab separated answers.
+    """
+    return [
+        "question {i}\t".format(i=i) + "\t".join(
+            "answer {j}".format(j=(i + j) % (no_lines // 4 + 1))
+            for j in range(no_answers)
+        ) + "\n"
+        for i in range(no_lines)
+    ]
+
+
+def bench_parse(sizes):
+    results = {}
+    for size in sizes:
+        lines = deck_lines(size)
+        for name, parse in (
+                ("delimiter", lambda: RandomizedAnswerProvider.parse_from_iter(
+                    lines)),
+                ("regex", lambda: RandomizedAnswerProvider.parse_from_iter_regex(
+                    lines, r"([^\t]*)\t([^\t]*)")),
+                ("preset", lambda: PresetAnswerProvider.parse_from_iter(
+                    lines)),
+        ):
+            seconds = timed(parse, repeat=1 if size >= 10 ** 6 else 3)
+            results["parse.{name}.{size}".format(name=name, size=size)] = \
+                seconds / size
+    return results
+
+
+def bench_get_answers(sizes, no_calls=1000):
+    results = {}
+    for size in sizes:
+        provider = RandomizedAnswerProvider.parse_from_iter(
+            deck_lines(size, 1), no_choices=4
+        )
+        questions = random.sample(list(provider.question_pool), min(size, 100))
+        calls = [questions[i % len(questions)] for i in range(no_calls)]
+        seconds = timed(lambda: [provider.get_answers(q) for q in calls])
+        results["get_answers.{size}".format(size=size)] = seconds / no_calls
+    return results
+
+
+def bench_generators(sizes, no_draws=10000):
+    results = {}
+    for size in sizes:
+        pool = {"q{i}".format(i=i): "a{i}".format(i=i) for i in range(size)}
+        for name, make in (
+                ("randomized", lambda: randomized_question_generator(
+                    pool, no_draws, with_replacement=True)),
+                ("inf", lambda: inf_question_generator(pool)),
+                ("adaptive", lambda: iter(AdaptiveQuestionGenerator(
+                    pool, no_repeat_window=min(size - 1, 10)))),
+        ):
+            seconds = timed(
+                lambda: list(itertools.islice(make(), no_draws))
+            )
+            results["generator.{name}.{size}".format(name=name, size=size)] = \
+                seconds / no_draws
+    return results
+
+
+def bench_render(no_questions=200, answer_log=None, name="render"):
+    provider = RandomizedAnswerProvider.parse_from_iter(
+        deck_lines(1000, 1), no_choices=4
+    )
+    # Answer each question then move to the next one
+    keys = "1x" * no_questions
+    _, key_reader = run_headless(
+        randomized_question_generator(
+            provider.get_all_questions(), no_questions
+        ),
+        provider,
+        keys,
+        answer_log=answer_log,
+    )
+    latencies = sorted(key_reader.latencies)
+    return {
+        name + ".keypress.median": latencies[len(latencies) // 2],
+        name + ".keypress.p95": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def bench_session_log(sizes):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        session_log = SessionLog(os.path.join(directory, "log.csv"), "deck")
+        try:
+            results.update(bench_render(answer_log=session_log, name="log"))
+        finally:
+            session_log.close()
+        for size in sizes:
+            log_path = os.path.join(directory, "{size}.csv".format(size=size))
+            with open(log_path, "w", newline="") as f:
+                csv.writer(f).writerows(
+                    (i, "deck", "question {q}".format(q=i % (size // 10 + 1)),
+                     "answer", "answer", i % 2, i % 5000)
+                    for i in range(size)
+                )
+
+            def compact():
+                store = StatsStore(":memory:")
+                store.compact(log_path)
+                store.close()
+
+            seconds = timed(compact, repeat=1 if size >= 10 ** 6 else 3)
+            results["log.compact.{size}".format(size=size)] = seconds / size
+    return results
+
+
+def bench_quiz_server(no_sessions=200, no_questions=20):
+    provider = RandomizedAnswerProvider.parse_from_iter(
+        deck_lines(10000, 1), no_choices=4
+    )
+    server = QuizServer.from_answer_provider(provider, no_questions)
+
+    async def run_sessions():
+        await server.start()
+        host, port = server.address()
+        async with server.server:
+            return await asyncio.gather(*(
+                loopback_client(host, port) for _ in range(no_sessions)
+            ))
+
+    start = time.perf_counter()
+    latencies = sorted(itertools.chain.from_iterable(
+        asyncio.run(run_sessions())
+    ))
+    seconds = time.perf_counter() - start
+    return {
+        "quiz_server.answer.median": latencies[len(latencies) // 2],
+        "quiz_server.answer.p95": latencies[int(len(latencies) * 0.95)],
+        "quiz_server.answer.throughput": seconds / len(latencies),
+    }
+
+
+def run_benchmarks(max_lines):
+    sizes = [10 ** i for i in range(3, len(str(max_lines)))]
+    results = {}
+    results.update(bench_parse(sizes))
+    results.update(bench_get_answers(sizes))
+    results.update(bench_generators(sizes))
+    results.update(bench_render())
+    results.update(bench_quiz_server())
+    results.update(bench_session_log(sizes))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print a comparison of results against baseline, returning the names
+    of benchmarks which are more than tolerance (a fraction) slower.
+    """
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1 if baseline[name] else 0
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(name)
+        print("{flag} {name}: {seconds:.3g}s ({change:+.0%})".format(
+            flag="!" if regressed else " ",
+            name=name,
+            seconds=seconds,
+            change=change,
+        ))
+    return regressions
+
+
+def main():
+    description = """Benchmark parsing, answer generation, question
+                     generation and rendering. Times are in seconds per
+                     line, call, draw or key press."""
+    parser = argparse.ArgumentParser(description=description)
+    # optional argument: max-lines
+    # description: largest number of lines to parse
+    parser.add_argument(
+        "-m",
+        "--max-lines",
+        type=int,
+        default=10 ** 5,
+        help="largest deck size to benchmark, default is 100000 (use 10000000 for the full suite)",
+    )
+    # optional argument: output
+    # description: file to save results to
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="file to save results to as JSON, which can be used as a baseline",
+    )
+    # optional argument: baseline
+    # description: results to compare against
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        help="JSON file of results from an earlier run to compare against, exits with status 1 if any benchmark has regressed",
+    )
+    # optional argument: tolerance
+    # description: allowed slowdown relative to the baseline
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="fraction a benchmark may be slower than the baseline before it counts as a regression, default is 0.25",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.max_lines)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+    else:
+        for name, seconds in sorted(results.items()):
+            print("{name}: {seconds:.3g}s".format(name=name, seconds=seconds))
+
+
+if __name__ == "__main__":
+    main()
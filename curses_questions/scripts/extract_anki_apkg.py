@@ -1,25 +1,56 @@
 #!/usr/bin/env python3
 
 """
-
+Extracts questions and answers from Anki .apkg files when run as a script.
 """
 
 import argparse
-import re
-import sqlite3
-import sys
-import zipfile
+from collections import OrderedDict
+
+from curses_questions.anki import (
+    expand_apkg_paths, fields_for, read_apkg_pairs, read_many_apkg_pairs
+)
+from curses_questions.deck_cache import write_deck
+from curses_questions.scripts.arguments import check_positive
+
+
+def field_pair(f1, f2):
+    """
+    Return the (question_index, answer_index) tuple for the 1 based field
+    numbers f1 and f2, or None if either is not numeric.
+    """
+    if not f1.isdigit() or not f2.isdigit():
+        return None
+    return int(f1) - 1, int(f2) - 1
+
+
+def parse_deck_fields(value):
+    """
+    Parse a --deck-fields value of the form PATTERN=F1,F2.
+    """
+    pattern, _, fields = value.rpartition("=")
+    split = fields.split(",")
+    indices = field_pair(*split) if len(split) == 2 else None
+    if not pattern or indices is None:
+        raise argparse.ArgumentTypeError(
+            "Expected PATTERN=F1,F2 but got: '{value}'".format(value=value)
+        )
+    return (pattern,) + indices
 
 
 def main():
     description = """Extract question/answer strings and output them tab
-                     separated to stdout."""
+                     separated to stdout. If more than one apkg file is
+                     given (directories and glob patterns are expanded),
+                     the files are converted in parallel and their
+                     questions merged into one deck."""
     parser = argparse.ArgumentParser(description=description)
     # positional argument: infile
-    # description: apkg file to extract questions from
+    # description: apkg files to extract questions from
     parser.add_argument(
         "infile",
-        help="name of apkg file to extract questions from",
+        nargs="+",
+        help="name of apkg file to extract questions from, or a directory or glob pattern matching apkg files",
     )
     parser.add_argument(
         "-f",
@@ -27,50 +58,75 @@ def main():
         nargs=2,
         help="Fields to use from the apkg file"
     )
+    parser.add_argument(
+        "-F",
+        "--deck-fields",
+        action="append",
+        type=parse_deck_fields,
+        default=[],
+        metavar="PATTERN=F1,F2",
+        help="Fields to use from apkg files whose file name matches the glob PATTERN, overriding --fields. May be given more than once",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=check_positive,
+        help="Number of processes to convert apkg files with, defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="File to write questions to instead of stdout",
+    )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Write a compiled deck to --output instead of text, which curses-questions can read in place of a text file",
+    )
     args = parser.parse_args()
+    if args.compile and not args.output:
+        parser.error("argument --compile: requires -o/--output")
 
-    with zipfile.ZipFile(args.infile, "r") as zip_file:
-        zip_file.extract("collection.anki2")
-    
     # Sort out fields
     if args.fields:
-        f1, f2 = args.fields
-        if not f1.isdigit() or not f2.isdigit():
+        fields = field_pair(*args.fields)
+        if fields is None:
             print("Detected non-numeric input for field number!")
             return
-        else:
-            f1, f2 = int(f1) - 1, int(f2) - 1
-            print_db_data(f1, f2)
     else:
-        print_db_data()
-
-
-def print_db_data(question_index=-1, answer_index=-1):
-    conn = sqlite3.connect("collection.anki2")
-    c = conn.cursor()
-    # See:
-    # https://decks.fandom.com/wiki/Anki_APKG_format_documentation
-    for (content,) in c.execute("SELECT flds FROM notes"):
-        parts = content.split("\x1f")
-        if question_index < 0 or answer_index < 0:
-            question_index = 0
-            answer_index = 1
-            # Attempt to get text contents from the note field
-            parts = [s for s in parts if  "[" not in s]
-        if len(parts) < 2:
-            print("Invalid note found: " + content, file=sys.stderr)
-        elif max(question_index, answer_index) > len(parts) - 1:
-            print("Field indices out of range")
-        else:
-            print("{question}\t{answer}".format(
-                question=prettify_text(parts[question_index]),
-                answer=prettify_text(parts[answer_index])
-            ))
-    conn.close()
+        fields = -1, -1
+    paths = expand_apkg_paths(args.infile)
+    if not paths:
+        print("No apkg files found!")
+        return
+    if len(paths) == 1:
+        # Deduplicated like several decks, the last answer read winning
+        pairs = OrderedDict(read_apkg_pairs(
+            paths[0], *fields_for(paths[0], args.deck_fields, fields)
+        )).items()
+    else:
+        pairs = read_many_apkg_pairs(
+            paths, args.deck_fields, fields, args.jobs
+        ).items()
+    if args.compile:
+        write_deck(
+            args.output,
+            ((question, [answer]) for question, answer in pairs),
+            answer_index=True
+        )
+    elif args.output:
+        with open(args.output, "w") as f:
+            print_pairs(pairs, f)
+    else:
+        print_pairs(pairs)
 
 
-def prettify_text(text):
-    return re.sub("<.*?>", " ", text)
+def print_pairs(pairs, file=None):
+    for question, answer in pairs:
+        print("{question}\t{answer}".format(
+            question=question,
+            answer=answer
+        ), file=file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Generates quizzes with answer keys from a deck, without a terminal.
+"""
+
+import argparse
+import random
+import sys
+
+from curses_questions.batch import (
+    FORMATS, capped_choices, csv_header, generate_quizzes
+)
+from curses_questions.scripts.arguments import check_positive
+from curses_questions.scripts.ask_questions import (
+    default_args, load_answer_provider
+)
+
+
+def max_choices(answer_provider):
+    """
+    Return the greatest number of choices answer_provider gives a question.
+    """
+    if hasattr(answer_provider, "question_to_answers_map"):
+        return max(
+            len(answers)
+            for answers in answer_provider.question_to_answers_map.values()
+        )
+    return capped_choices(answer_provider)
+
+
+def main():
+    description = """Generate quizzes from a text file of questions and
+                     answers (in the same formats as curses-questions),
+                     along with their answer keys, as JSON Lines or CSV.
+                     The same seed always generates the same quizzes,
+                     whatever the number of jobs."""
+    parser = argparse.ArgumentParser(description=description)
+    # Dictates how answers for questions are obtained
+    answer_format_group = parser.add_mutually_exclusive_group()
+    # positional argument: infile
+    # description: name of file to read questions from
+    parser.add_argument(
+        "infile",
+        type=argparse.FileType("r"),
+        help="name of file to read questions from",
+    )
+    # optional argument: delimiter
+    # description: delimiter in input lines which divides question and answer
+    parser.add_argument(
+        "-d",
+        "--delimiter",
+        help="delimiter in input lines which divide the question and answer, default is tab",
+        default="\t",
+    )
+    # optional argument: regex
+    # description: use regex for question/answer extraction
+    parser.add_argument(
+        "-r",
+        "--regex",
+        help="Use only lines matching the given regex, taking question/answer as the first/second capture group respectively",
+    )
+    # optional argument: choices
+    # description: number of answer choices for a question
+    answer_format_group.add_argument(
+        "-c",
+        "--choices",
+        type=check_positive,
+        help="number of answers to choose from per question, default is 3",
+        default=3,
+    )
+    # optional argument: preset-answers
+    # description: use preset answers dictated in input file
+    answer_format_group.add_argument(
+        "-pa",
+        "--preset-answers",
+        help="interpret input lines as a question followed by its answers, the first being correct, as curses-questions does",
+        action="store_true",
+    )
+    # optional argument: quizzes
+    # description: number of quizzes to generate
+    parser.add_argument(
+        "-n",
+        "--quizzes",
+        type=check_positive,
+        help="number of quizzes to generate, default is 1",
+        default=1,
+    )
+    # optional argument: questions
+    # description: number of questions per quiz
+    parser.add_argument(
+        "-q",
+        "--questions",
+        type=check_positive,
+        help="number of questions in each quiz (no duplicates), default is 10",
+        default=10,
+    )
+    # optional argument: format
+    # description: output format
+    parser.add_argument(
+        "-F",
+        "--format",
+        choices=FORMATS,
+        help="output format, JSON Lines with one quiz per line or CSV with one question per row, default is jsonl",
+        default="jsonl",
+    )
+    # optional argument: output
+    # description: file to write quizzes to
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="file to write quizzes to instead of stdout",
+    )
+    # optional argument: seed
+    # description: seed for choosing questions and answers
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="seed for choosing questions and answers, defaults to a random seed",
+    )
+    # optional argument: jobs
+    # description: number of processes to generate quizzes with
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=check_positive,
+        help="number of processes to generate quizzes with, defaults to the number of CPUs",
+    )
+    # optional argument: no-numpy
+    # description: don't use NumPy
+    parser.add_argument(
+        "--no-numpy",
+        help="don't use NumPy to choose questions and answers even if it's installed. Quizzes generated with and without NumPy differ for the same seed",
+        action="store_true",
+    )
+    args = parser.parse_args()
+    seed = args.seed if args.seed is not None else random.getrandbits(63)
+
+    answer_provider = load_answer_provider(default_args(
+        [args.infile],
+        delimiter=args.delimiter,
+        regex=args.regex,
+        preset_answers=args.preset_answers,
+        choices=args.choices,
+    ))
+    if not answer_provider.get_all_questions():
+        print("Input file is empty or has no lines in the correct format!")
+        return
+    output = open(args.output, "w", newline="") if args.output \
+        else sys.stdout
+    try:
+        if args.format == "csv":
+            output.write(csv_header(max_choices(answer_provider)))
+        for text in generate_quizzes(
+                answer_provider, args.quizzes, args.questions, seed,
+                args.format, args.jobs, not args.no_numpy):
+            output.write(text)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+"""
+Runs a server keeping decks in memory for curses-questions --server.
+"""
+
+import argparse
+import signal
+import sys
+
+from curses_questions.deck_server import default_socket_path, serve
+from curses_questions.scripts.ask_questions import (
+    default_args, load_answer_provider
+)
+
+
+def load_deck(options):
+    """
+    Create an answer provider from options sent by a client, see
+    ask_questions.server_options().
+    """
+    with open(options["path"], encoding=options["encoding"]) as infile:
+        args = default_args(
+            [infile],
+            delimiter=options["delimiter"],
+            regex=options["regex"],
+            preset_answers=options["preset_answers"],
+            choices=options["choices"],
+            fields=options["fields"],
+            jobs=options["jobs"],
+            cache=options["cache"],
+            similar=options["similar"],
+        )
+        return load_answer_provider(args)
+
+
+def main():
+    description = """Keep decks parsed in memory, so that runs of
+                     curses-questions with the --server option start
+                     without parsing their input file. Decks are parsed
+                     when first asked for and again whenever their file
+                     is modified."""
+    parser = argparse.ArgumentParser(description=description)
+    # optional argument: socket
+    # description: path of the socket to listen on
+    parser.add_argument(
+        "-s",
+        "--socket",
+        help="path of the Unix domain socket to listen on, defaults to {path}".format(path=default_socket_path()),
+        default=default_socket_path(),
+    )
+    args = parser.parse_args()
+    # Exit normally on SIGTERM so the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+    try:
+        serve(args.socket, load_deck)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        sys.exit(e)
+
+
+if __name__ == "__main__":
+    main()
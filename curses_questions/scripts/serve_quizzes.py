@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""
+Runs a TCP server asking questions to many clients at once.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+
+from curses_questions.decks import deck_option
+from curses_questions.quiz_server import QuizServer
+from curses_questions.scripts.arguments import check_positive
+from curses_questions.scripts.ask_questions import (
+    default_args, parse_weight, load_answer_provider
+)
+
+
+def main():
+    description = """Ask questions from text files of questions and answers
+                     (in the same formats as curses-questions) to everyone
+                     who connects, for example with telnet or netcat. The
+                     input files are parsed once and shared by every
+                     session, each of which gets its own questions and
+                     score. Clients answer with the number of their choice,
+                     or q to quit."""
+    parser = argparse.ArgumentParser(description=description)
+    # Dictates if user wants a set number, or infinite questions
+    question_group = parser.add_mutually_exclusive_group()
+    # Dictates how answers for questions are obtained
+    answer_format_group = parser.add_mutually_exclusive_group()
+    # positional argument: infile
+    # description: names of files to read questions from
+    parser.add_argument(
+        "infiles",
+        nargs="+",
+        type=argparse.FileType("r"),
+        metavar="infile",
+        help="names of files to read questions from, questions from several files are mixed together",
+    )
+    # optional argument: delimiter
+    # description: delimiter in input lines which divides question and answer
+    parser.add_argument(
+        "-d",
+        "--delimiter",
+        help="delimiter in input lines which divide the question and answer, default is tab",
+        default="\t",
+    )
+    # optional argument: regex
+    # description: use regex for question/answer extraction
+    parser.add_argument(
+        "-r",
+        "--regex",
+        help="Use only lines matching the given regex, taking question/answer as the first/second capture group respectively",
+    )
+    # optional argument: precede
+    # description: text to precede all questions
+    parser.add_argument(
+        "-p",
+        "--precede",
+        help="precede all question strings with this string",
+        default="",
+    )
+    # optional argument: choices
+    # description: number of answer choices for a question
+    answer_format_group.add_argument(
+        "-c",
+        "--choices",
+        type=check_positive,
+        help="number of answers to choose from per question, default is 3",
+        default=3,
+    )
+    # optional argument: preset-answers
+    # description: use preset answers dictated in input file
+    answer_format_group.add_argument(
+        "-pa",
+        "--preset-answers",
+        help="interpret input lines as a question followed by its answers, the first being correct, as curses-questions does",
+        action="store_true",
+    )
+    # optional argument: questions
+    # description: number of questions to ask each client
+    question_group.add_argument(
+        "-n",
+        "--questions",
+        type=check_positive,
+        help="number of questions to ask each client (no duplicates), default is 10",
+        default=10,
+    )
+    # optional argument: endless
+    # description: keep asking questions until clients quit
+    question_group.add_argument(
+        "-e",
+        "--endless",
+        help="keep asking questions until clients quit",
+        action="store_true",
+    )
+    # optional argument: weight
+    # description: relative weight of questions from some input files
+    parser.add_argument(
+        "-w",
+        "--weight",
+        action="append",
+        type=parse_weight,
+        default=[],
+        metavar="PATTERN=WEIGHT",
+        help="With several input files, ask questions from input files whose name (with or without its extension) matches the glob PATTERN WEIGHT times as often as other questions, the default weight being 1. May be given more than once",
+    )
+    # optional argument: cache
+    # description: cache the parsed input file in a compiled format
+    parser.add_argument(
+        "-C",
+        "--cache",
+        help="Cache the parsed input file in a compiled format, as curses-questions does. Only allowed with one input file",
+        action="store_true",
+    )
+    # optional argument: similar
+    # description: offer incorrect answers similar to the correct answer
+    parser.add_argument(
+        "--similar",
+        help="Offer incorrect answers which look similar to the correct answer rather than random ones, as curses-questions does. Only allowed with one input file",
+        action="store_true",
+    )
+    # optional argument: seed
+    # description: seed for choosing questions
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed for choosing questions, the nth client to connect is asked the same questions in every run with the same seed",
+    )
+    # optional argument: host
+    # description: address to listen on
+    parser.add_argument(
+        "--host",
+        help="address to listen on, default is 127.0.0.1 (use 0.0.0.0 to accept connections from other machines)",
+        default="127.0.0.1",
+    )
+    # optional argument: port
+    # description: port to listen on
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="port to listen on, default is 7070",
+        default=7070,
+    )
+    # optional argument: max-sessions
+    # description: most clients served at once
+    parser.add_argument(
+        "--max-sessions",
+        type=check_positive,
+        help="turn away clients connecting while this many are already connected",
+    )
+    # optional argument: idle-timeout
+    # description: seconds before idle clients are disconnected
+    parser.add_argument(
+        "--idle-timeout",
+        type=check_positive,
+        help="disconnect clients which haven't answered for this many seconds, default is 600",
+        default=600,
+    )
+    args = parser.parse_args()
+    if len(args.infiles) > 1 and (args.cache or args.similar):
+        parser.error("arguments -C/--cache and --similar: not allowed with several input files")
+    if args.similar and args.preset_answers:
+        parser.error("argument --similar: not allowed with argument -pa/--preset-answers")
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    answer_provider = load_answer_provider(default_args(
+        args.infiles,
+        delimiter=args.delimiter,
+        regex=args.regex,
+        preset_answers=args.preset_answers,
+        choices=args.choices,
+        cache=args.cache,
+        similar=args.similar,
+    ))
+    if not answer_provider.get_all_questions():
+        print("Input file is empty or has no lines in the correct format!")
+        return
+    server = QuizServer.from_answer_provider(
+        answer_provider,
+        None if args.endless else args.questions,
+        args.seed,
+        [deck_option(f.name, args.weight, 1) for f in args.infiles],
+        preceding_str=args.precede,
+        idle_timeout=args.idle_timeout,
+        max_sessions=args.max_sessions,
+    )
+
+    async def serve():
+        await server.start(args.host, args.port)
+        host, port = server.address()
+        print("Serving questions on {host}:{port}".format(
+            host=host, port=port
+        ))
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        sys.exit(e)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+"""
+Shows statistics for each question from logs written by
+curses-questions --log.
+"""
+
+import argparse
+
+from curses_questions.scripts.arguments import check_positive
+from curses_questions.session_log import (
+    DECK_SEPARATOR, ORDERS, default_log_path, default_stats_path, StatsStore
+)
+
+
+def main():
+    description = """Show how often each question has been answered
+                     correctly and how long it took to answer, from answers
+                     logged by curses-questions --log. New rows of the log
+                     are first added to a database of statistics for each
+                     question, so the log needn't be kept."""
+    parser = argparse.ArgumentParser(description=description)
+    # optional argument: log
+    # description: log file written by curses-questions --log
+    parser.add_argument(
+        "-l",
+        "--log",
+        action="append",
+        help="log file written by curses-questions --log, defaults to {path}. May be given more than once".format(path=default_log_path()),
+    )
+    # optional argument: db
+    # description: database of statistics
+    parser.add_argument(
+        "--db",
+        help="SQLite database to keep statistics in, defaults to {path}".format(path=default_stats_path()),
+        default=default_stats_path(),
+    )
+    # optional argument: deck
+    # description: only show questions from some decks
+    parser.add_argument(
+        "--deck",
+        metavar="PATTERN",
+        help="only show questions from decks whose path matches the glob PATTERN",
+        default="*",
+    )
+    # optional argument: sort
+    # description: which questions to show first
+    parser.add_argument(
+        "-s",
+        "--sort",
+        choices=sorted(ORDERS),
+        help="show the least accurately answered questions first (accuracy), those slowest to answer (slowest) or the most answered (answered), default is accuracy",
+        default="accuracy",
+    )
+    # optional argument: number
+    # description: number of questions to show
+    parser.add_argument(
+        "-n",
+        "--number",
+        type=check_positive,
+        help="number of questions to show, default is 20",
+        default=20,
+    )
+    # optional argument: min-answered
+    # description: only show questions answered this many times
+    parser.add_argument(
+        "-m",
+        "--min-answered",
+        type=check_positive,
+        help="only show questions answered at least this many times, default is 1",
+        default=1,
+    )
+    # optional argument: truncate
+    # description: empty logs once their rows are in the database
+    parser.add_argument(
+        "--truncate",
+        help="empty the logs once their rows have been added to the database. Answers logged by sessions running at the same time may be lost",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    store = StatsStore(args.db)
+    try:
+        for log in args.log or [default_log_path()]:
+            store.compact(log, args.truncate)
+        decks = store.decks(args.deck)
+        if not decks:
+            print("No answers have been logged for decks matching '{pattern}'".format(pattern=args.deck))
+            return
+        for deck, no_cards, answered, accuracy, mean_ms in decks:
+            print("{deck}: {cards} questions, {answered} answers, {accuracy:.0%} correct, {mean:.1f}s per answer".format(
+                deck=deck.replace(DECK_SEPARATOR, ", "),
+                cards=no_cards,
+                answered=answered,
+                accuracy=accuracy,
+                mean=mean_ms / 1000,
+            ))
+        print()
+        print("{accuracy:>8} {answered:>8} {mean:>8} {fastest:>8} {slowest:>8}  question".format(
+            accuracy="correct", answered="answered", mean="mean", fastest="fastest", slowest="slowest"
+        ))
+        for _, question, answered, accuracy, mean_ms, fastest_ms, slowest_ms in store.cards(
+                args.deck, args.sort, args.number, args.min_answered):
+            print("{accuracy:>8.0%} {answered:>8} {mean:>7.1f}s {fastest:>7.1f}s {slowest:>7.1f}s  {question}".format(
+                accuracy=accuracy,
+                answered=answered,
+                mean=mean_ms / 1000,
+                fastest=fastest_ms / 1000,
+                slowest=slowest_ms / 1000,
+                question=question,
+            ))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+An inverted index of the words in each line of a deck, saved next to the
+deck in a SQLite database, so that the lines matching a search can be
+found without reading the whole deck.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+
+from curses_questions.deck_cache import cache_dir
+
+WORD = re.compile(r"\w+")
+VERSION = 1
+
+
+def words(text):
+    """
+    Return the set of lower case words in text.
+    """
+    return set(WORD.findall(text.lower()))
+
+
+def index_path(path):
+    """
+    Return the path of the index for the deck at path, next to the deck if
+    its directory is writable and in the cache directory otherwise.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    if os.access(directory, os.W_OK):
+        return os.path.join(directory, "." + name + ".cqindex")
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir(), digest + ".cqindex")
+
+
+def parse_query(query):
+    """
+    Return a list of (word, is_prefix) tuples from the search query, a
+    whitespace separated list of keywords each of which may end in "*" to
+    match words beginning with it.
+    """
+    terms = []
+    for keyword in query.split():
+        is_prefix = keyword.endswith("*")
+        keyword_words = WORD.findall(keyword.lower())
+        for i, word in enumerate(keyword_words):
+            terms.append((word, is_prefix and i == len(keyword_words) - 1))
+    return terms
+
+
+class SearchIndex:
+    """
+    Postings of words to the byte offsets of the lines of a deck containing
+    them. The index records the mtime and size of the deck it was built
+    from, and is rebuilt if they change.
+    """
+
+    def __init__(self, deck_path, encoding="utf-8", path=None):
+        self.deck_path = deck_path
+        self.encoding = encoding
+        self.path = path or index_path(deck_path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        if not self.up_to_date():
+            self.build()
+
+    def deck_stat(self):
+        stat = os.stat(self.deck_path)
+        return "{version} {mtime} {size}".format(
+            version=VERSION, mtime=stat.st_mtime_ns, size=stat.st_size
+        )
+
+    def up_to_date(self):
+        try:
+            row = self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'stat'"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return False
+        return row is not None and row[0] == self.deck_stat()
+
+    def postings(self):
+        """
+        Yield (word, offset) tuples for each word of each line of the deck.
+        """
+        with open(self.deck_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                offset = 0
+                for line in iter(mapped.readline, b""):
+                    for word in words(line.decode(self.encoding)):
+                        yield word, offset
+                    offset += len(line)
+
+    def build(self):
+        stat = self.deck_stat()
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS postings")
+            self.conn.execute("DROP TABLE IF EXISTS meta")
+            self.conn.execute(
+                """CREATE TABLE postings (
+                       word TEXT NOT NULL,
+                       offset INTEGER NOT NULL,
+                       PRIMARY KEY (word, offset)
+                   ) WITHOUT ROWID"""
+            )
+            self.conn.execute(
+                "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self.conn.executemany(
+                "INSERT INTO postings (word, offset) VALUES (?, ?)",
+                self.postings()
+            )
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('stat', ?)", (stat,)
+            )
+
+    def search(self, query):
+        """
+        Return the sorted byte offsets of the lines of the deck containing
+        every keyword of query, see parse_query().
+        """
+        terms = parse_query(query)
+        if not terms:
+            return []
+        selects, parameters = [], []
+        for word, is_prefix in terms:
+            if is_prefix:
+                # Words beginning with word sort between word and word with
+                # its last character incremented
+                selects.append(
+                    "SELECT offset FROM postings WHERE word >= ? AND word < ?"
+                )
+                parameters.extend((word, word[:-1] + chr(ord(word[-1]) + 1)))
+            else:
+                selects.append("SELECT offset FROM postings WHERE word = ?")
+                parameters.append(word)
+        return [
+            offset for (offset,) in self.conn.execute(
+                " INTERSECT ".join(selects) + " ORDER BY offset", parameters
+            )
+        ]
+
+    def close(self):
+        self.conn.close()
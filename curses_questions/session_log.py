@@ -0,0 +1,319 @@
+"""
+An append-only CSV log of the answers given in sessions, written by a
+background thread, and a SQLite store of per-card statistics compacted from
+it.
+"""
+
+import csv
+import io
+import mmap
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from curses_questions.readers import line_blocks
+
+LOG_FIELDS = (
+    "time", "deck", "question", "correct_answer", "chosen_answer", "correct",
+    "response_ms",
+)
+# Expressions for a card's accuracy and mean response time, which have
+# indexes so the weakest or slowest cards are found without sorting
+ACCURACY = "CAST(correct AS REAL) / answered"
+MEAN_MS = "CAST(total_ms AS REAL) / answered"
+ORDERS = {
+    "accuracy": ACCURACY + " ASC",
+    "slowest": MEAN_MS + " DESC",
+    "answered": "answered DESC",
+}
+# Number of bytes of the log parsed at a time when compacting
+COMPACT_BLOCK_SIZE = 1 << 24
+# Separates the paths of the input files in the deck id of a session with
+# several input files. NUL can't be used as csv can't read it before Python
+# 3.11
+DECK_SEPARATOR = os.pathsep
+
+
+def data_dir():
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return os.path.join(base, "curses-questions")
+
+
+def default_log_path():
+    """
+    Return the path of the default session log.
+    """
+    return os.path.join(data_dir(), "sessions.csv")
+
+
+def default_stats_path():
+    """
+    Return the path of the default card statistics database.
+    """
+    return os.path.join(data_dir(), "stats.sqlite")
+
+
+class SessionLog:
+    """
+    Appends a row to the log at path for each answer in a session of the
+    deck deck_id. Rows are put on a queue and written by a background
+    thread, each batch of rows waiting on the queue being appended with a
+    single write, so recording an answer never waits on the disk.
+    """
+
+    def __init__(self, path, deck_id, clock=time.time):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.deck_id = deck_id
+        self.clock = clock
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(
+            target=self.write_rows, name="session-log", daemon=True
+        )
+        self.thread.start()
+
+    def record(self, question, correct_answer, chosen_answer, response_time):
+        """
+        Log chosen_answer being given for question response_time seconds
+        after it was asked.
+        """
+        self.queue.put_nowait((
+            "{time:.3f}".format(time=self.clock()),
+            self.deck_id,
+            question.rstrip("\r\n"),
+            correct_answer.rstrip("\r\n"),
+            chosen_answer.rstrip("\r\n"),
+            int(chosen_answer == correct_answer),
+            round(response_time * 1000),
+        ))
+
+    def write_rows(self):
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            closed = False
+            while not closed:
+                # Wait for a row, then take every other row already queued
+                rows = [self.queue.get()]
+                while True:
+                    try:
+                        rows.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if rows[-1] is None:
+                    closed = True
+                    rows.pop()
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                f.write(buffer.getvalue())
+                f.flush()
+
+    def close(self):
+        """
+        Write any queued rows and stop the background thread.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+
+def log_end(path, offset=0):
+    """
+    Return the offset after the last complete row of the log at path, not
+    before offset. A session may be part way through writing the row after.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= offset:
+            return offset
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return max(mapped.rfind(b"\n", offset) + 1, offset)
+
+
+def read_log(path, offset=0, end=None, block_size=COMPACT_BLOCK_SIZE):
+    """
+    Yield the rows of the log at path between the byte offsets offset
+    (which must be the start of a row) and end, decoding roughly block_size
+    bytes at a time.
+    """
+    end = log_end(path, offset) if end is None else end
+    if end <= offset:
+        return
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start, block_end in line_blocks(
+                    mapped, offset, end, block_size):
+                reader = csv.reader(io.StringIO(
+                    mapped[start:block_end].decode("utf-8"), newline=""
+                ))
+                while True:
+                    try:
+                        row = next(reader)
+                    except StopIteration:
+                        break
+                    except csv.Error:
+                        # A malformed row, the reader carries on after it
+                        continue
+                    yield row
+
+
+class StatsStore:
+    """
+    Per-card statistics in a SQLite database: the number of times each
+    question of each deck was answered and answered correctly, and the
+    total, fastest and slowest response times. Rows appended to session
+    logs are added by compact(), which remembers how much of each log it
+    has read.
+    """
+
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(
+                os.path.dirname(os.path.abspath(path)), exist_ok=True
+            )
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS cards (
+                       deck TEXT NOT NULL,
+                       question TEXT NOT NULL,
+                       answered INTEGER NOT NULL,
+                       correct INTEGER NOT NULL,
+                       total_ms INTEGER NOT NULL,
+                       fastest_ms INTEGER NOT NULL,
+                       slowest_ms INTEGER NOT NULL,
+                       last_answered REAL NOT NULL,
+                       PRIMARY KEY (deck, question)
+                   ) WITHOUT ROWID"""
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS cards_accuracy "
+                "ON cards ({accuracy})".format(accuracy=ACCURACY)
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS cards_mean_ms "
+                "ON cards ({mean_ms})".format(mean_ms=MEAN_MS)
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS cards_answered "
+                "ON cards (answered)"
+            )
+            # How far each log has been compacted
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS logs (
+                       path TEXT PRIMARY KEY,
+                       offset INTEGER NOT NULL
+                   )"""
+            )
+
+    def compact(self, log_path, truncate=False):
+        """
+        Add the rows appended to the log at log_path since it was last
+        compacted to the statistics, returning the number of rows added. If
+        truncate is True the log is emptied afterwards, which loses rows
+        written by sessions running at the same time.
+        """
+        log_path = os.path.abspath(log_path)
+        if not os.path.exists(log_path):
+            return 0
+        row = self.conn.execute(
+            "SELECT offset FROM logs WHERE path = ?", (log_path,)
+        ).fetchone()
+        offset = row[0] if row else 0
+        if os.path.getsize(log_path) < offset:
+            # The log has been truncated or replaced since
+            offset = 0
+        end = log_end(log_path, offset)
+        # Deck and question to [answered, correct, total_ms, fastest_ms,
+        # slowest_ms, last_answered], rows being in the order they were
+        # answered
+        cards = {}
+        no_rows = 0
+        for row in read_log(log_path, offset, end):
+            try:
+                answered_at, deck, question, _, _, correct, response_ms = row
+                response_ms = int(response_ms)
+            except ValueError:
+                # A malformed row
+                continue
+            no_rows += 1
+            card = cards.get((deck, question))
+            if card is None:
+                cards[deck, question] = [
+                    1, correct == "1", response_ms, response_ms, response_ms,
+                    answered_at
+                ]
+                continue
+            card[0] += 1
+            if correct == "1":
+                card[1] += 1
+            card[2] += response_ms
+            if response_ms < card[3]:
+                card[3] = response_ms
+            elif response_ms > card[4]:
+                card[4] = response_ms
+            card[5] = answered_at
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO cards (deck, question, answered, correct,
+                       total_ms, fastest_ms, slowest_ms, last_answered)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (deck, question) DO UPDATE SET
+                       answered = answered + excluded.answered,
+                       correct = correct + excluded.correct,
+                       total_ms = total_ms + excluded.total_ms,
+                       fastest_ms = min(fastest_ms, excluded.fastest_ms),
+                       slowest_ms = max(slowest_ms, excluded.slowest_ms),
+                       last_answered = max(last_answered,
+                                           excluded.last_answered)""",
+                (key + tuple(card) for key, card in cards.items())
+            )
+            if truncate:
+                open(log_path, "w").close()
+                end = 0
+            self.conn.execute(
+                "INSERT OR REPLACE INTO logs (path, offset) VALUES (?, ?)",
+                (log_path, end)
+            )
+        return no_rows
+
+    def cards(self, deck_pattern="*", order="accuracy", limit=20,
+              min_answered=1):
+        """
+        Return a list of (deck, question, answered, accuracy, mean_ms,
+        fastest_ms, slowest_ms) tuples for up to limit cards answered at
+        least min_answered times from decks matching the glob deck_pattern,
+        the least accurate first if order is "accuracy", the slowest to
+        answer first if "slowest" and the most answered first if
+        "answered".
+        """
+        return self.conn.execute(
+            """SELECT deck, question, answered, {accuracy}, {mean_ms},
+                      fastest_ms, slowest_ms
+               FROM cards
+               WHERE deck GLOB ? AND answered >= ?
+               ORDER BY {order}
+               LIMIT ?""".format(
+                accuracy=ACCURACY, mean_ms=MEAN_MS, order=ORDERS[order]
+            ),
+            (deck_pattern, min_answered, limit)
+        ).fetchall()
+
+    def decks(self, deck_pattern="*"):
+        """
+        Return a list of (deck, cards, answered, accuracy, mean_ms) tuples
+        summarising each deck matching the glob deck_pattern.
+        """
+        return self.conn.execute(
+            """SELECT deck, COUNT(*), SUM(answered),
+                      CAST(SUM(correct) AS REAL) / SUM(answered),
+                      CAST(SUM(total_ms) AS REAL) / SUM(answered)
+               FROM cards
+               WHERE deck GLOB ?
+               GROUP BY deck
+               ORDER BY deck""",
+            (deck_pattern,)
+        ).fetchall()
+
+    def close(self):
+        self.conn.close()
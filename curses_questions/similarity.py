@@ -0,0 +1,203 @@
+"""
+Indexes of answers for finding answers which look similar to one another,
+used to choose plausible incorrect answers. Answers are described by
+hashed character trigram counts along with buckets of their length and
+the type of text they hold (numbers, dates, words), the nearest neighbours
+of an answer being those with the greatest cosine similarity. NumPy is used
+if installed, otherwise answers are only matched by their buckets.
+"""
+
+import hashlib
+import os
+import random
+import re
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from curses_questions.deck_cache import cache_dir
+
+NGRAM = 3
+NGRAM_DIMENSIONS = 64
+LENGTH_BUCKETS = 8
+TYPES = (
+    ("number", re.compile(r"[-+]?[\d,]*\.?\d+%?")),
+    ("date", re.compile(r"[\d\s/.:-]*\d[\d\s/.:-]*")),
+    ("word", re.compile(r"[^\W\d_]+")),
+    ("words", re.compile(r"[^\W\d_]+([\s'-][^\W\d_]+)*")),
+    ("mixed", re.compile(r".*", re.DOTALL)),
+)
+# Weight of the length and type buckets relative to the trigram counts
+BUCKET_WEIGHT = 0.5
+
+
+def answer_type(answer):
+    """
+    Return the index in TYPES of the kind of text answer holds.
+    """
+    answer = answer.strip()
+    for index, (_, pattern) in enumerate(TYPES):
+        if pattern.fullmatch(answer):
+            return index
+
+
+def length_bucket(answer):
+    return min(LENGTH_BUCKETS - 1, len(answer).bit_length())
+
+
+def trigrams(answer):
+    padded = " " + answer.lower() + " "
+    return [padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)]
+
+
+def answers_digest(answers):
+    """
+    Return a digest identifying the sequence of strings answers.
+    """
+    digest = hashlib.sha1()
+    for answer in answers:
+        digest.update(answer.encode("utf-8", "surrogatepass") + b"\0")
+    return digest.hexdigest()
+
+
+class BucketIndex:
+    """
+    An index matching answers only by their type and length buckets, used
+    when NumPy is unavailable.
+    """
+
+    def __init__(self, answers):
+        self.size = len(answers)
+        self.keys = []
+        self.buckets = {}
+        for position, answer in enumerate(answers):
+            key = answer_type(answer), length_bucket(answer)
+            self.keys.append(key)
+            self.buckets.setdefault(key, []).append(position)
+            self.buckets.setdefault(key[0], []).append(position)
+
+    def neighbours(self, position, k):
+        """
+        Return up to k positions of answers similar to the answer at
+        position, excluding position itself.
+        """
+        key = self.keys[position]
+        for members in (self.buckets[key], self.buckets[key[0]]):
+            if len(members) > k:
+                break
+        else:
+            members = range(self.size)
+        chosen = set()
+        while len(chosen) < min(k, len(members) - 1):
+            candidate = random.choice(members)
+            if candidate != position:
+                chosen.add(candidate)
+        return list(chosen)
+
+
+class VectorIndex:
+    """
+    An index of answer feature vectors held in a NumPy matrix, whose rows
+    are ordered by answer type so that each type's rows form a contiguous
+    block searched with a single matrix-vector product.
+    """
+
+    def __init__(self, vectors, types):
+        order = numpy.argsort(types, kind="stable")
+        self.vectors = numpy.ascontiguousarray(vectors[order])
+        self.types = types
+        # Row of self.vectors holding each answer, and vice versa
+        self.order = order
+        self.rows = numpy.empty_like(order)
+        self.rows[order] = numpy.arange(len(order))
+        bounds = numpy.searchsorted(
+            types[order], numpy.arange(len(TYPES) + 1)
+        )
+        self.blocks = list(zip(bounds[:-1], bounds[1:]))
+
+    @classmethod
+    def build(cls, answers):
+        size = len(answers)
+        dimensions = NGRAM_DIMENSIONS + LENGTH_BUCKETS + len(TYPES)
+        vectors = numpy.zeros((size, dimensions), dtype=numpy.float32)
+        types = numpy.empty(size, dtype=numpy.int8)
+        # Hashing the same trigram twice is wasted work, most decks repeat
+        # trigrams a great deal
+        columns = {}
+        rows, cols, buckets = [], [], []
+        for position, answer in enumerate(answers):
+            for gram in trigrams(answer):
+                column = columns.get(gram)
+                if column is None:
+                    column = columns[gram] = (
+                        zlib.crc32(gram.encode("utf-8", "surrogatepass"))
+                        % NGRAM_DIMENSIONS
+                    )
+                rows.append(position)
+                cols.append(column)
+            types[position] = answer_type(answer)
+            buckets.append(length_bucket(answer))
+        numpy.add.at(vectors, (numpy.array(rows), numpy.array(cols)), 1)
+        grams = vectors[:, :NGRAM_DIMENSIONS]
+        grams /= numpy.maximum(
+            numpy.linalg.norm(grams, axis=1, keepdims=True), 1
+        )
+        positions = numpy.arange(size)
+        vectors[positions, NGRAM_DIMENSIONS + numpy.array(buckets, int)] = \
+            BUCKET_WEIGHT
+        vectors[positions, NGRAM_DIMENSIONS + LENGTH_BUCKETS + types] = \
+            BUCKET_WEIGHT
+        vectors /= numpy.linalg.norm(vectors, axis=1, keepdims=True)
+        return cls(vectors, types)
+
+    @classmethod
+    def load_or_build(cls, answers, path):
+        """
+        Load the index of answers saved at path, building and saving it if
+        path does not exist.
+        """
+        if os.path.exists(path):
+            with numpy.load(path) as saved:
+                return cls(saved["vectors"], saved["types"])
+        index = cls.build(answers)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = path + ".{pid}.tmp.npz".format(pid=os.getpid())
+        numpy.savez(
+            temp_path, vectors=index.vectors[index.rows], types=index.types
+        )
+        os.replace(temp_path, path)
+        return index
+
+    def neighbours(self, position, k):
+        """
+        Return the positions of the (up to) k answers most similar to the
+        answer at position, excluding position itself.
+        """
+        row = self.rows[position]
+        start, end = self.blocks[self.types[position]]
+        if end - start <= k:
+            start, end = 0, len(self.vectors)
+        scores = self.vectors[start:end] @ self.vectors[row]
+        scores[row - start] = -numpy.inf
+        k = min(k, end - start - 1)
+        nearest = numpy.argpartition(-scores, k - 1)[:k] if k else []
+        return self.order[start + numpy.asarray(nearest, int)].tolist()
+
+
+def similarity_index(answers, cache=False):
+    """
+    Return an index of the sequence answers, a VectorIndex if NumPy is
+    installed and a BucketIndex otherwise. If cache is True, VectorIndexes
+    are saved to and loaded from the cache directory.
+    """
+    if numpy is None:
+        return BucketIndex(answers)
+    if cache:
+        return VectorIndex.load_or_build(answers, os.path.join(
+            cache_dir(), answers_digest(answers) + ".similar.npz"
+        ))
+    return VectorIndex.build(answers)
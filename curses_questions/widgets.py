@@ -1,7 +1,26 @@
 import curses
+import functools
 import textwrap
 
 
+@functools.lru_cache(maxsize=4096)
+def wrap_text(text, width, initial_indent="", subsequent_indent="",
+              drop_whitespace=True):
+    """
+    Return a tuple of the lines of text wrapped to width. Results are cached
+    so redraws of unchanged text at the same width do not wrap it again.
+    """
+    return tuple(textwrap.wrap(
+        text,
+        width=max(1, width),
+        initial_indent=initial_indent,
+        subsequent_indent=subsequent_indent,
+        drop_whitespace=drop_whitespace,
+        # Keep the wrapped text the same length as text
+        expand_tabs=False,
+    ))
+
+
 class QuestionWidget:
     def __init__(
         self,
@@ -16,25 +35,57 @@ class QuestionWidget:
         self.intro_flag = intro_flag
         self.question_flag = question_flag
         self.question_number = starting_question_number
+        # True if the widget has changed since it was last drawn
+        self.dirty = True
 
     def next_question(self, question):
         self.question = question
         self.question_number += 1
+        self.dirty = True
+
+    def segments(self):
+        return (
+            ("Question " + str(self.question_number), self.intro_flag),
+            (": " + self.preceding_str, curses.A_NORMAL),
+            (self.question, self.question_flag),
+        )
+
+    def lines(self, width):
+        """
+        Return the lines of the question wrapped to width.
+        """
+        text = "".join(text for text, _ in self.segments())
+        # Whitespace is kept so that line lengths add up to len(text)
+        return wrap_text(text, width - 1, drop_whitespace=False)
 
-    def draw(self, stdscr):
+    def draw(self, window):
         """
-        Draw the specified question at the top of the screen, with
+        Draw the specified question wrapped at the top left of window, with
         'Question <question_no>' having flag intro_flag, and
         the question itself having flag question_flag
         """
-        stdscr.addstr(
-            1,
-            2,
-            "Question " + str(self.question_number),
-            self.intro_flag,
-        )
-        stdscr.addstr(": " + self.preceding_str)
-        stdscr.addstr(self.question, self.question_flag)
+        window.erase()
+        max_y, max_x = window.getmaxyx()
+        segments = self.segments()
+        line_start = 0
+        for line_no, line in enumerate(self.lines(max_x)[:max_y]):
+            window.move(line_no, 0)
+            line_end = line_start + len(line)
+            # Don't start lines with the whitespace they were broken on
+            first = line_end - len(line.lstrip()) if line_no else line_start
+            # Draw the parts of each segment which fall on this line
+            segment_start = 0
+            for text, flag in segments:
+                segment_end = segment_start + len(text)
+                start = max(first, segment_start)
+                end = min(line_end, segment_end)
+                if start < end:
+                    window.addstr(
+                        line[start - line_start:end - line_start], flag
+                    )
+                segment_start = segment_end
+            line_start = line_end
+        self.dirty = False
 
 
 class AnswerWidget:
@@ -49,65 +100,237 @@ class AnswerWidget:
         self.indent = indent
         self.green_answers = []
         self.red_answers = []
+        # Numbers of answers whose colour has changed since they were last
+        # drawn
+        self.damaged_answers = set()
+        # The wrapped lines of all answers as (answer number, text) tuples,
+        # and the indices into these lines of each answer's lines
+        self.lines = []
+        self.answer_lines = {}
+        # Index of the first line shown, and the number of lines shown
+        self.scroll = 0
+        self.page_height = 0
+
+    @property
+    def answers(self):
+        return self._answers
+
+    @answers.setter
+    def answers(self, answers):
+        self._answers = answers
+        self.scroll = 0
+        self.dirty = True
+
+    def scroll_by(self, no_lines):
+        """
+        Scroll the answers by no_lines, which may be negative to scroll up.
+        """
+        self.scroll = max(0, self.scroll + no_lines)
+        self.dirty = True
 
     def add_green_answer(self, answer_index):
         self.green_answers.append(answer_index)
+        self.damaged_answers.add(answer_index)
 
     def add_red_answer(self, answer_index):
         self.red_answers.append(answer_index)
+        self.damaged_answers.add(answer_index)
 
     def clear_coloured_answers(self):
+        self.damaged_answers.update(self.green_answers, self.red_answers)
         self.green_answers.clear()
         self.red_answers.clear()
 
-    def draw(self, stdscr, switch_flags=False):
+    def needs_draw(self):
+        return self.dirty or bool(self.damaged_answers)
+
+    def answer_flag(self, number, switch_flags=False):
+        oddp = not (number % 2) if (switch_flags) else (number % 2)
+        flag = self.odd_flag if oddp else self.even_flag
+        # Green or red text overrides bold and dim effects
+        if number in self.green_answers:
+            flag = curses.color_pair(self.correct_colour)
+        elif number in self.red_answers:
+            flag = curses.color_pair(self.false_colour)
+        return flag
+
+    def layout(self, width):
         """
-        Draw the contents of self.answers on the screen. answers whose index
-        is in self.green_answers or self.red_answers will be drawn with those
-        respective colours.
+        Wrap the answers to width, setting self.lines and self.answer_lines.
         """
-        current_line = 2
+        self.lines = []
+        self.answer_lines = {}
         for number, answer in enumerate(self.answers, 1):
-            current_line += 1  # Ensure we leave a blank line between answers
+            if number > 1:
+                # Ensure we leave a blank line between answers
+                self.lines.append((None, ""))
             # Prepend number to answer
-            answer = str(number) + ": " + answer
-            text_wrap = textwrap.wrap(
-                answer,
-                width=stdscr.getmaxyx()[1] - (self.indent + 1),
-                initial_indent=" " * self.indent,
-                subsequent_indent=" " * (self.indent + 3),
+            text_wrap = wrap_text(
+                str(number) + ": " + answer,
+                width,
+                " " * self.indent,
+                " " * (self.indent + 3),
+            )
+            self.answer_lines[number] = range(
+                len(self.lines), len(self.lines) + len(text_wrap)
             )
-            oddp = not (number % 2) if (switch_flags) else (number % 2)
-            flag = self.odd_flag if oddp else self.even_flag
-            # Green or red text overrides bold and dim effects
-            if number in self.green_answers:
-                flag = curses.color_pair(self.correct_colour)
-            elif number in self.red_answers:
-                flag = curses.color_pair(self.false_colour)
-            for line in text_wrap:
-                stdscr.addstr(current_line, 0, line, flag)
-                current_line += 1
+            self.lines.extend((number, line) for line in text_wrap)
+
+    def draw(self, window, switch_flags=False):
+        """
+        Draw the contents of self.answers in window. answers whose index
+        is in self.green_answers or self.red_answers will be drawn with those
+        respective colours. If only the colours of answers have changed since
+        the last draw, only the lines of those answers are drawn. If the
+        answers do not fit in window, the lines from self.scroll onwards are
+        drawn, followed by a line giving the position in the answers.
+        """
+        if not self.dirty:
+            for number in self.damaged_answers:
+                self.draw_answer(window, number, switch_flags)
+            self.damaged_answers.clear()
+            return
+        window.erase()
+        max_y, max_x = window.getmaxyx()
+        self.layout(max_x - (self.indent + 1))
+        if len(self.lines) <= max_y:
+            self.page_height = max_y
+        else:
+            # Leave the last line for the scroll position
+            self.page_height = max_y - 1
+        self.scroll = min(self.scroll, len(self.lines) - self.page_height)
+        self.scroll = max(0, self.scroll)
+        for number in self.answer_lines:
+            self.draw_answer(window, number, switch_flags)
+        if self.page_height < max_y:
+            window.addstr(
+                max_y - 1, self.indent,
+                "-- lines {first}-{last} of {total}, PgUp/PgDn to scroll --"
+                .format(
+                    first=self.scroll + 1,
+                    last=min(self.scroll + self.page_height, len(self.lines)),
+                    total=len(self.lines),
+                )[:max(0, max_x - self.indent - 1)],
+                curses.A_DIM,
+            )
+        self.dirty = False
+        self.damaged_answers.clear()
+
+    def draw_answer(self, window, number, switch_flags=False):
+        """
+        Draw the lines of answer number which are scrolled into view.
+        """
+        flag = self.answer_flag(number, switch_flags)
+        for line_index in self.answer_lines.get(number, ()):
+            line_no = line_index - self.scroll
+            if 0 <= line_no < self.page_height:
+                window.addstr(line_no, 0, self.lines[line_index][1], flag)
 
 
 class RunningTotalWidget:
-    """Draws a 'running total' at the top left of a curses window."""
+    """Draws a 'running total' at the top right of a curses window."""
 
     def __init__(self):
         self.no_correct = 0
         self.no_questions = 0
+        self.dirty = True
 
     def increment(self, is_answer_correct):
         self.no_questions += 1
         if is_answer_correct:
             self.no_correct += 1
+        self.dirty = True
 
-    def draw(self, stdscr):
-        # Print out running total of questions answered at the top right
-        # of the screen
-        max_y, max_x = stdscr.getmaxyx()
+    def draw(self, window):
+        # Print out running total of questions answered at the right of
+        # the window
+        max_y, max_x = window.getmaxyx()
         running_total_str = \
             "{questions_answered_correctly}/{total_questions_asked}".format(
                 questions_answered_correctly=self.no_correct,
                 total_questions_asked=self.no_questions,
+            )[-(max_x - 1):]
+        window.erase()
+        window.addstr(0, max_x - len(running_total_str) - 1, running_total_str)
+        self.dirty = False
+
+
+class Renderer:
+    """
+    Lays out the question, answer and running total widgets in their own
+    sub windows of stdscr and redraws only the widgets which have changed,
+    flushing all windows to the terminal with a single doupdate().
+    """
+
+    # Columns reserved for the running total at the top right of the screen
+    RUNNING_TOTAL_WIDTH = 16
+    MIN_HEIGHT = 5
+    MIN_WIDTH = 24
+
+    def __init__(
+            self, stdscr, question_widget, answer_widget,
+            running_total_widget):
+        self.stdscr = stdscr
+        self.question_widget = question_widget
+        self.answer_widget = answer_widget
+        self.running_total_widget = running_total_widget
+        self.windows = None
+
+    def resize(self):
+        """
+        Recreate the widget windows to fit stdscr and redraw everything, this
+        should be called on start up, whenever the terminal is resized and
+        whenever the question needs a different number of lines.
+        """
+        self.stdscr.erase()
+        max_y, max_x = self.stdscr.getmaxyx()
+        total_width = min(self.RUNNING_TOTAL_WIDTH, max_x // 2)
+        question_width = max_x - total_width - 3
+        self.question_height = self.fit_question_height(max_y, question_width)
+        if max_y < self.MIN_HEIGHT or max_x < self.MIN_WIDTH:
+            # The terminal is too small to draw anything
+            self.windows = None
+        else:
+            self.windows = (
+                self.stdscr.derwin(self.question_height, question_width, 1, 2),
+                self.stdscr.derwin(
+                    max_y - self.question_height - 3, max_x - 2,
+                    self.question_height + 2, 1
+                ),
+                self.stdscr.derwin(1, total_width, 1, max_x - total_width - 1),
             )
-        stdscr.addstr(1, max_x - len(running_total_str) - 2, running_total_str)
+            self.stdscr.border(0)
+        self.question_widget.dirty = True
+        self.answer_widget.dirty = True
+        self.running_total_widget.dirty = True
+        self.stdscr.noutrefresh()
+
+    def fit_question_height(self, max_y, question_width):
+        # The question may take up to a third of the screen
+        return max(1, min(
+            len(self.question_widget.lines(question_width)), (max_y - 4) // 3
+        ))
+
+    def render(self, switch_flags=False):
+        """
+        Draw the widgets which have changed since they were last drawn.
+        """
+        if self.windows is None:
+            return
+        if self.question_widget.dirty:
+            max_y = self.stdscr.getmaxyx()[0]
+            question_width = self.windows[0].getmaxyx()[1]
+            if self.fit_question_height(max_y, question_width) \
+               != self.question_height:
+                self.resize()
+        question_window, answer_window, running_total_window = self.windows
+        if self.question_widget.dirty:
+            self.question_widget.draw(question_window)
+            question_window.noutrefresh()
+        if self.answer_widget.needs_draw():
+            self.answer_widget.draw(answer_window, switch_flags)
+            answer_window.noutrefresh()
+        if self.running_total_widget.dirty:
+            self.running_total_widget.draw(running_total_window)
+            running_total_window.noutrefresh()
+        curses.doupdate()
@@ -14,7 +14,12 @@ setup(
         "console_scripts":
         [
             "curses-questions=curses_questions.scripts.ask_questions:main",
-            "curses-anki=curses_questions.scripts.extract_anki_apkg:main"
+            "curses-anki=curses_questions.scripts.extract_anki_apkg:main",
+            "curses-questions-bench=curses_questions.scripts.benchmark:main",
+            "curses-questions-server=curses_questions.scripts.serve_decks:main",
+            "curses-questions-batch=curses_questions.scripts.generate_quizzes:main",
+            "curses-questions-quiz-server=curses_questions.scripts.serve_quizzes:main",
+            "curses-questions-stats=curses_questions.scripts.session_stats:main"
         ],
     },
     install_requires=[],